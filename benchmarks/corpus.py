@@ -0,0 +1,86 @@
+"""
+基准测试帧库
+采集各游戏界面的截图，按界面名称分目录保存: benchmarks/corpus/<界面>/<序号>.png
+界面名称与 GameState 同名（如 LOBBY、MAP_SELECT）时，detect_state 基准会校验识别结果
+
+用法:
+    python -m benchmarks.corpus LOBBY --count 5 --interval 1
+"""
+
+import argparse
+import time
+from pathlib import Path
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from utils.logger import logger
+
+CORPUS_DIR = Path(__file__).resolve().parent / "corpus"
+
+
+def capture(
+    screen: str,
+    count: int = 5,
+    interval: float = 1.0,
+    corpus_dir: Path = CORPUS_DIR,
+    serial: Optional[str] = None,
+) -> list[Path]:
+    """从设备采集 count 帧到 corpus_dir/<screen>/。"""
+    from drivers.android_device import AndroidDeviceDriver
+
+    screen_dir = corpus_dir / screen
+    screen_dir.mkdir(parents=True, exist_ok=True)
+    start_index = len(list(screen_dir.glob("*.png")))
+
+    device = AndroidDeviceDriver(serial)
+    device.start()
+    saved = []
+    try:
+        frame, frame_index = device.wait_new_frame(0, timeout=10.0)
+        if frame is None:
+            raise RuntimeError("未获取到画面")
+
+        for i in range(count):
+            path = screen_dir / f"{start_index + i:04d}.png"
+            cv2.imwrite(str(path), frame)
+            saved.append(path)
+            logger.info(f"已保存: {path}")
+            time.sleep(interval)
+            frame, frame_index = device.wait_new_frame(frame_index, timeout=0)
+    finally:
+        device.stop()
+    return saved
+
+
+def load_corpus(corpus_dir: Path = CORPUS_DIR) -> dict[str, list[tuple[str, np.ndarray]]]:
+    """读取帧库，返回 {界面: [(文件名, 帧), ...]}。"""
+    corpus: dict[str, list[tuple[str, np.ndarray]]] = {}
+    if not corpus_dir.exists():
+        return corpus
+
+    for screen_dir in sorted(p for p in corpus_dir.iterdir() if p.is_dir()):
+        frames = []
+        for path in sorted(screen_dir.glob("*.png")):
+            frame = cv2.imread(str(path))
+            if frame is not None:
+                frames.append((path.name, frame))
+        if frames:
+            corpus[screen_dir.name] = frames
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="采集基准测试帧")
+    parser.add_argument("screen", help="界面名称，建议与 GameState 同名")
+    parser.add_argument("--count", type=int, default=5)
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--serial", default=None)
+    parser.add_argument("--corpus", type=Path, default=CORPUS_DIR)
+    args = parser.parse_args()
+    capture(args.screen, args.count, args.interval, args.corpus, args.serial)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+模拟市场下的购买策略对比
+用挂单簿模型代替真实交易行，在虚拟时钟下运行 MarketHandler 的详情页购买流程，
+对比各购买策略每分钟买到的数量、平均单价、购买次数与余额读取次数。
+
+用法:
+    python -m benchmarks.market_sim --minutes 60 --target 400 --max 480 --seed 0
+"""
+
+import argparse
+import logging
+import random
+import tempfile
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+
+from modules.market import MarketHandler, PurchaseOrder
+from modules.strategy import STRATEGIES, create_strategy
+from utils import config
+from utils.clock import SimClock
+from utils.logger import logger
+from utils.price_history import price_history
+
+# 各操作在虚拟时钟上的耗时（秒）
+CLICK_COST = 0.05
+OCR_COST = 0.03
+FRAME_INTERVAL = 1 / 30
+NAVIGATION_COST = 2.5  # 进入/离开详情页
+
+
+class SimMarket:
+    """挂单簿：基准价随机游走，按泊松过程补充新挂单"""
+
+    def __init__(self, base_price: float, seed: int = 0):
+        self.base_price = base_price
+        self._random = random.Random(seed)
+        self.listings: list[list[float]] = []  # [价格, 数量]，按价格升序
+        self.now = 0.0
+        for _ in range(20):
+            self._add_listing()
+
+    def _add_listing(self) -> None:
+        price = round(self.base_price * (1 + self._random.gauss(0, 0.04)))
+        self.listings.append([price, self._random.randint(10, 300)])
+        self.listings.sort()
+
+    def advance_to(self, now: float) -> None:
+        while self.now + 1.0 <= now:
+            self.now += 1.0
+            self.base_price *= 1 + self._random.gauss(0, 0.002)
+            if self._random.random() < 0.3:
+                self._add_listing()
+            if len(self.listings) > 200:
+                self.listings.pop()
+
+    @property
+    def displayed(self) -> int:
+        return int(self.listings[0][0]) if self.listings else 0
+
+    def buy(self, quantity: int) -> tuple[float, int]:
+        """按价格从低到高成交，返回 (总花费, 成交数量)；挂单不足时只成交能买到的部分"""
+        cost = 0.0
+        filled = 0
+        while quantity > 0 and self.listings:
+            price, available = self.listings[0]
+            take = min(quantity, available)
+            cost += take * price
+            quantity -= take
+            filled += take
+            if take == available:
+                self.listings.pop(0)
+            else:
+                self.listings[0][1] -= take
+        return cost, filled
+
+
+class SimMarketOperator:
+    """只实现详情页购买流程用到的 Agent 接口"""
+
+    def __init__(self, market: SimMarket, balance: float = 10_000_000):
+        self.market = market
+        self.clock = SimClock()
+        self.balance = balance
+        self.spent = 0.0
+        self.bought = 0
+        self.purchases = 0
+        self.coin_reads = 0
+        self._pending_quantity = 0
+        self._frame = np.zeros((1080, 2400), dtype=np.uint8)
+        self._frame_index = 0
+        self._shown_price = -1
+
+    def _sync(self) -> None:
+        self.market.advance_to(self.clock.time())
+        if self.market.displayed != self._shown_price:
+            self._shown_price = self.market.displayed
+            x1, y1, x2, y2 = config.per_price_roi
+            self._frame[y1:y2, x1:x2] = self._shown_price % 251
+            self._frame_index += 1
+
+    def get_frame(self) -> np.ndarray:
+        self._sync()
+        return self._frame
+
+    def get_frame_index(self) -> int:
+        self._sync()
+        return self._frame_index
+
+    def wait_new_frame(
+        self, last_index: int, timeout: float = 1.0
+    ) -> tuple[Optional[np.ndarray], int]:
+        self.clock.advance(FRAME_INTERVAL)
+        return self.get_frame(), self.get_frame_index()
+
+    def click(self, coord: tuple[int, int]) -> bool:
+        self.clock.advance(CLICK_COST)
+        self._sync()
+        if coord == config.buy_31:
+            self._pending_quantity = 31
+        elif coord == config.buy_200:
+            self._pending_quantity = 200
+        elif coord == config.buy_confirm and self._pending_quantity:
+            cost, filled = self.market.buy(self._pending_quantity)
+            if filled:
+                self.balance -= cost
+                self.spent += cost
+                self.bought += filled
+                self.purchases += 1
+            self._pending_quantity = 0
+        elif coord == config.coin_ui:
+            self.coin_reads += 1
+        return True
+
+    def read_text(
+        self, target_type: str, cropped: bool = True, frame: Optional[np.ndarray] = None
+    ) -> Optional[str]:
+        self.clock.advance(OCR_COST)
+        self._sync()
+        if target_type == "price":
+            return str(self.market.displayed)
+        if target_type == "coin":
+            return str(int(self.balance))
+        return None
+
+    def wait_and_click_target(self, target: str, **kwargs: Any) -> bool:
+        self.clock.advance(NAVIGATION_COST)
+        return True
+
+
+def simulate(
+    strategy: str,
+    minutes: float,
+    target_price: int,
+    max_acceptable_price: int,
+    seed: int,
+) -> dict[str, float]:
+    market = SimMarket(base_price=target_price * 1.02, seed=seed)
+    operator = SimMarketOperator(market)
+    # 价格历史的时间戳与统计窗口按虚拟时间计算
+    price_history.clock = operator.clock
+    handler = MarketHandler(operator)  # type: ignore[arg-type]
+    handler.strategy = create_strategy(strategy)
+    handler.order = PurchaseOrder(
+        f"sim-{strategy}", target_price, max_acceptable_price, 10**9
+    )
+
+    deadline = minutes * 60
+    while operator.clock.time() < deadline:
+        operator.clock.advance(NAVIGATION_COST)  # 进入详情页
+        if not handler._handle_preview_price(max_acceptable_price):
+            continue
+        handler._run_strategy(target_price)
+        handler._leave_market_detail()
+        # 下次进入详情页时策略会查询历史滑点，等后台写入完成使结果可复现
+        price_history.flush()
+
+    elapsed_minutes = operator.clock.time() / 60
+    return {
+        "items_per_minute": operator.bought / elapsed_minutes,
+        "avg_unit_price": operator.spent / operator.bought if operator.bought else 0.0,
+        "purchases": operator.purchases,
+        "coin_reads": operator.coin_reads,
+        "bought": operator.bought,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟市场下的购买策略对比")
+    parser.add_argument("--minutes", type=float, default=60)
+    parser.add_argument("--target", type=int, default=400)
+    parser.add_argument("--max", type=int, default=480)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--strategies", nargs="*", default=list(STRATEGIES))
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logger.setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 模拟数据不写入真实的价格历史
+        price_history.path = Path(tmp) / "prices.sqlite3"
+        results = {
+            name: simulate(name, args.minutes, args.target, args.max, args.seed)
+            for name in args.strategies
+        }
+        price_history.close()
+
+    print(f"{'策略':<14}{'每分钟数量':>12}{'平均单价':>12}{'购买次数':>10}{'余额读取':>10}{'总数量':>10}")
+    for name, item in results.items():
+        print(
+            f"{name:<14}{item['items_per_minute']:>12.1f}{item['avg_unit_price']:>12.1f}"
+            f"{item['purchases']:>10}{item['coin_reads']:>10}{item['bought']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+端到端模拟运行
+用模拟设备与虚拟时钟跑完整的 Bot 流程，统计虚拟耗时、真实耗时与交互次数
+
+用法:
+    python -m benchmarks.simulate sim/scenario.json --rounds 150
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from bot import Bot, run_buy_rounds
+from core.agent import Agent
+from drivers.sim_device import SimAdbClient, SimDevice, SimVision
+from utils.clock import SimClock
+from utils.logger import logger
+from utils.metrics import metrics
+from utils.price_history import price_history
+from vision.engine import VisionEngine
+
+
+def build_sim_bot(scenario_file: str | Path) -> tuple[Bot, SimDevice, SimClock]:
+    """构建运行在模拟设备上的 Bot；全局指标与价格历史改按该虚拟时钟计时。"""
+    clock = SimClock()
+    metrics.use_clock(clock)
+    price_history.clock = clock
+    device = SimDevice(scenario_file, clock)
+    agent = Agent(
+        android=device,  # type: ignore[arg-type]
+        adb=SimAdbClient(device),  # type: ignore[arg-type]
+        vision=SimVision(VisionEngine(), device),  # type: ignore[arg-type]
+        clock=clock,
+    )
+    return Bot(operator=agent), device, clock
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟设备端到端运行")
+    parser.add_argument("scenario", type=Path, help="场景文件 (JSON)")
+    parser.add_argument("--rounds", type=int, default=150)
+    args = parser.parse_args()
+
+    bot, device, clock = build_sim_bot(args.scenario)
+    wall_start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        # 模拟数据（虚拟时间戳）不写入真实的价格历史
+        price_history.path = Path(tmp) / "prices.sqlite3"
+        try:
+            run_buy_rounds(bot, args.rounds)
+        except KeyboardInterrupt:
+            logger.info("用户手动停止")
+        price_history.close()
+    wall = time.perf_counter() - wall_start
+
+    rounds = metrics.summary()["counters"].get("rounds", {}).get("count", 0)
+    logger.info(
+        f"模拟完成: 轮数={rounds} 虚拟耗时={clock.time():.1f}s 真实耗时={wall:.1f}s "
+        f"加速比={clock.time() / max(wall, 1e-9):.1f}x 点击={device.click_count} "
+        f"界面切换={device.transition_count}"
+    )
+
+
+if __name__ == "__main__":
+    main()
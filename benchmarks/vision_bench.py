@@ -0,0 +1,348 @@
+"""
+视觉栈基准测试
+在帧库上测量模板匹配、OCR 与状态识别的耗时，并与保存的基线比较
+
+用法:
+    python -m benchmarks.vision_bench --save-baseline
+    python -m benchmarks.vision_bench --baseline benchmarks/baseline.json --threshold 0.2
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from benchmarks.corpus import CORPUS_DIR, load_corpus
+from modules.state import GameState
+from utils import config
+from utils.logger import logger
+from utils.metrics import Metrics, metrics
+from vision.ocr import match_text
+
+BASELINE_FILE = Path(__file__).resolve().parent / "baseline.json"
+
+
+class _ReplayDevice:
+    """回放帧库的设备，替代 AndroidDeviceDriver 供 Bot.detect_state 使用。"""
+
+    def __init__(self):
+        self.frame: Optional[np.ndarray] = None
+        self.frame_index = 0
+
+    def set_frame(self, frame: np.ndarray) -> None:
+        self.frame = frame
+        self.frame_index += 1
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def get_frame(self) -> Optional[np.ndarray]:
+        return self.frame
+
+    def get_frame_index(self) -> int:
+        return self.frame_index
+
+    def wait_new_frame(self, last_index: int, timeout: float = 1.0):
+        return self.frame, self.frame_index
+
+    def click(self, coord) -> bool:
+        return True
+
+    def touch_down(self, coord) -> bool:
+        return True
+
+    def touch_up(self, coord) -> bool:
+        return True
+
+    def swipe(self, start_coord, end_coord) -> bool:
+        return True
+
+
+def _count(after: dict[str, Any], before: dict[str, Any], name: str) -> int:
+    return after.get(name, {}).get("count", 0) - before.get(name, {}).get("count", 0)
+
+
+class VisionBenchmark:
+    def __init__(
+        self,
+        corpus: dict[str, list[tuple[str, np.ndarray]]],
+        repeat: int = 5,
+        targets: Optional[list[str]] = None,
+        texts: Optional[list[str]] = None,
+        margin: int = 20,
+        det_scale: Optional[float] = None,
+    ):
+        from bot import Bot
+        from core.agent import Agent
+
+        self.corpus = corpus
+        self.repeat = repeat
+        self.device = _ReplayDevice()
+        self.agent = Agent(android=self.device)  # type: ignore[arg-type]
+        self.bot = Bot(operator=self.agent)
+        self.vision = self.agent.vision
+        matcher = self.vision.matcher
+        # coords.json 中的 warehouse / marketplace 等是文字检测区域，没有模板图片
+        self.targets = targets or [
+            name for name in sorted(matcher.coords) if matcher.has_template(name)
+        ]
+        self.texts = texts or ["箭", "T46M"]
+        self.margin = margin
+        self.det_scale = config.OCR_DET_SCALE if det_scale is None else det_scale
+        self.results = Metrics(max_samples=100_000)
+        self.mismatches: list[str] = []
+
+    def _time(self, name: str, func: Callable[[], Any]) -> Any:
+        result = None
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            result = func()
+            self.results.observe(name, time.perf_counter() - start)
+        return result
+
+    def _frames(self):
+        for screen, frames in self.corpus.items():
+            for filename, frame in frames:
+                yield screen, filename, frame
+
+    def bench_find_template(self) -> None:
+        matcher = self.vision.matcher
+        for _, _, frame in self._frames():
+            for target in self.targets:
+                self._time(
+                    "find_template", lambda: matcher.find_template(frame, target)
+                )
+
+    def bench_prefilter(self) -> None:
+        """对比预筛开启/关闭的耗时，并在帧库上校验预筛从不改变匹配结果（不误拒真实目标）。"""
+        matcher = self.vision.matcher
+        cases = {
+            "margin": lambda frame, target, on: matcher.find_template(
+                frame, target, margin=self.margin, prefilter=on
+            ),
+            "anywhere": lambda frame, target, on: matcher.find_template_anywhere(
+                frame, target, prefilter=on
+            ),
+        }
+        before = metrics.summary()["counters"]
+        for screen, filename, frame in self._frames():
+            for target in self.targets:
+                for case, func in cases.items():
+                    full = self._time(
+                        f"prefilter.{case}.off", lambda: func(frame, target, False)
+                    )
+                    filtered = self._time(
+                        f"prefilter.{case}.on", lambda: func(frame, target, True)
+                    )
+                    if full != filtered:
+                        self.mismatches.append(
+                            f"{screen}/{filename}: 预筛改变了 '{target}' 的{case}匹配结果 "
+                            f"{full} -> {filtered}"
+                        )
+
+        after = metrics.summary()["counters"]
+        rejected = _count(after, before, "match.prefilter.reject")
+        passed = _count(after, before, "match.prefilter.pass")
+        if rejected + passed:
+            logger.info(
+                f"预筛: 排除 {rejected} 次, 通过 {passed} 次, "
+                f"排除率 {rejected / (rejected + passed):.1%}"
+            )
+
+    def bench_find_templates(self) -> None:
+        matcher = self.vision.matcher
+        for _, _, frame in self._frames():
+            self._time("find_templates", lambda: matcher.find_templates(frame, self.targets))
+
+    def bench_find_template_anywhere(self) -> None:
+        matcher = self.vision.matcher
+        for _, _, frame in self._frames():
+            for target in self.targets:
+                self._time(
+                    "find_template_anywhere",
+                    lambda: matcher.find_template_anywhere(frame, target),
+                )
+
+    def bench_do_ocr(self) -> None:
+        ocr = self.vision.ocr
+        for _, _, frame in self._frames():
+            for name, target in self.vision._ocr_targets.items():
+                self._time(
+                    f"do_ocr.{name}",
+                    lambda: ocr.do_ocr(
+                        frame, target["roi"], target["whitelist"], cropped=True
+                    ),
+                )
+
+    def bench_find_text_and_crop(self) -> None:
+        ocr = self.vision.ocr
+        for _, _, frame in self._frames():
+            for text in self.texts:
+                self._time(
+                    "find_text_and_crop", lambda: ocr.find_text_and_crop(frame, text)
+                )
+
+    def bench_text_regions(self) -> None:
+        """对比整帧检测与限定区域+缩小检测的耗时，并校验两者找到的文字位置一致。"""
+        ocr = self.vision.ocr
+        regions = {
+            template_type: self.vision.get_region(template_type)
+            for template_type in ("warehouse", "marketplace")
+        }
+        for screen, filename, frame in self._frames():
+            full = self._time(
+                "read_page.full", lambda: ocr.read_page(frame, det_scale=1.0)
+            )
+            for template_type, region in regions.items():
+                fast = self._time(
+                    f"read_page.{template_type}",
+                    lambda: ocr.read_page(frame, region, self.det_scale),
+                )
+                for text in self.texts:
+                    expected = match_text(full, text)
+                    if region is not None and expected is not None:
+                        x, y = expected.center
+                        if not (region[0] <= x < region[2] and region[1] <= y < region[3]):
+                            continue
+                    actual = match_text(fast, text)
+                    if (expected is None) != (actual is None) or (
+                        expected is not None
+                        and actual is not None
+                        and max(
+                            abs(a - b) for a, b in zip(expected.center, actual.center)
+                        )
+                        > (expected.box[3] - expected.box[1]) / 2
+                    ):
+                        self.mismatches.append(
+                            f"{screen}/{filename}: {template_type} 区域检测改变了 '{text}' 的定位结果 "
+                            f"{expected and expected.center} -> {actual and actual.center}"
+                        )
+
+    def bench_detect_state(self) -> None:
+        for screen, filename, frame in self._frames():
+            self.device.set_frame(frame)
+            state = self._time("detect_state", self.bot.detect_state)
+            expected = GameState.__members__.get(screen)
+            if expected is not None and state != expected:
+                self.mismatches.append(
+                    f"{screen}/{filename}: 状态识别为 {state.name}，期望 {expected.name}"
+                )
+
+    def run(self, skip: tuple[str, ...] = ()) -> dict[str, dict[str, float]]:
+        benches = {
+            "find_template": self.bench_find_template,
+            "find_templates": self.bench_find_templates,
+            "prefilter": self.bench_prefilter,
+            "find_template_anywhere": self.bench_find_template_anywhere,
+            "do_ocr": self.bench_do_ocr,
+            "find_text_and_crop": self.bench_find_text_and_crop,
+            "text_regions": self.bench_text_regions,
+            "detect_state": self.bench_detect_state,
+        }
+        for name, bench in benches.items():
+            if name in skip:
+                continue
+            logger.info(f"基准测试: {name}")
+            bench()
+
+        report = {}
+        for name, item in self.results.summary()["timings"].items():
+            report[name] = {
+                "count": item["count"],
+                "mean_ms": item["mean"] * 1000,
+                "p50_ms": item["p50"] * 1000,
+                "p95_ms": item["p95"] * 1000,
+                "ops_per_sec": 1.0 / item["mean"] if item["mean"] > 0 else 0.0,
+            }
+        return report
+
+
+def compare(
+    report: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    threshold: float,
+) -> list[str]:
+    """返回 p50 相对基线变慢超过 threshold 的条目。"""
+    regressions = []
+    for name, current in report.items():
+        base = baseline.get(name)
+        if not base or base["p50_ms"] <= 0:
+            continue
+        ratio = current["p50_ms"] / base["p50_ms"]
+        if ratio > 1 + threshold:
+            regressions.append(
+                f"{name}: p50 {base['p50_ms']:.3f}ms -> {current['p50_ms']:.3f}ms (x{ratio:.2f})"
+            )
+    return regressions
+
+
+def print_report(report: dict[str, dict[str, float]]) -> None:
+    print(f"{'名称':<28}{'次数':>8}{'mean(ms)':>12}{'p50(ms)':>12}{'p95(ms)':>12}{'ops/s':>12}")
+    for name, item in sorted(report.items()):
+        print(
+            f"{name:<28}{item['count']:>8}{item['mean_ms']:>12.3f}"
+            f"{item['p50_ms']:>12.3f}{item['p95_ms']:>12.3f}{item['ops_per_sec']:>12.1f}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="视觉栈基准测试")
+    parser.add_argument("--corpus", type=Path, default=CORPUS_DIR)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--targets", nargs="*", help="参与模板匹配的模板名，默认全部")
+    parser.add_argument("--texts", nargs="*", help="find_text_and_crop 查找的文字")
+    parser.add_argument("--margin", type=int, default=20, help="预筛基准中的搜索边距")
+    parser.add_argument(
+        "--det-scale", type=float, help="区域检测基准中的检测缩放比例，默认取 config.OCR_DET_SCALE"
+    )
+    parser.add_argument("--skip", nargs="*", default=[], help="跳过的基准项")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--output", type=Path, help="将结果写入 JSON")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        logger.error(f"帧库为空: {args.corpus}，请先运行 python -m benchmarks.corpus")
+        return 2
+
+    bench = VisionBenchmark(
+        corpus, args.repeat, args.targets, args.texts, args.margin, args.det_scale
+    )
+    report = bench.run(tuple(args.skip))
+    print_report(report)
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    exit_code = 0
+    for mismatch in bench.mismatches:
+        logger.error(f"校验失败: {mismatch}")
+        exit_code = 1
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        logger.info(f"已保存基线: {args.baseline}")
+    elif args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare(report, baseline, args.threshold)
+        for regression in regressions:
+            logger.error(f"性能回退: {regression}")
+        if regressions:
+            exit_code = 1
+        else:
+            logger.info(f"与基线相比无超过 {args.threshold:.0%} 的回退")
+
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
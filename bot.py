@@ -1,18 +1,22 @@
-import time
 import subprocess
 from dataclasses import dataclass
+from typing import Callable, Optional
+from utils import config
 from utils.logger import logger
+from utils.metrics import MetricsReporter, metrics
+from utils.trace import tracer
 from core.agent import Agent
 from modules.expection import GameRebootException
 from modules.recovery import GameRecoveryHandler
-from modules.market import MarketHandler
+from modules.market import MarketHandler, PurchaseOrder
 from modules.mail import MailHandler
 from modules.glitch import GlitchHandler
 from modules.map import MapHandler
 from modules.lobby import LobbyHandler
-from modules.state import GameState
+from modules.state import GameState, STATE_GRAPH, UNKNOWN_TIMEOUT, detection_stages
 from modules.prepare import PrepareHandler
 from modules.reconnect import ReconnectHandler
+from vision.service import VisionClient
 
 
 @dataclass
@@ -27,9 +31,7 @@ class _BotServices:
     reconnect: ReconnectHandler
 
 
-def _build_services() -> _BotServices:
-    operator = Agent()
-
+def _build_services(operator: Agent) -> _BotServices:
     return _BotServices(
         operator=operator,
         market=MarketHandler(operator),
@@ -45,11 +47,21 @@ def _build_services() -> _BotServices:
 class Bot:
     """游戏自动化机器人，封装所有游戏操作逻辑"""
 
-    def __init__(self):
+    def __init__(
+        self,
+        serial: Optional[str] = None,
+        vision: Optional[VisionClient] = None,
+        operator: Optional[Agent] = None,
+    ):
         """
         初始化机器人
+
+        Args:
+            serial: 设备序列号，为空时使用第一台已连接设备
+            vision: 共享视觉服务客户端，为空时使用进程内视觉引擎
+            operator: 已构造好的 Agent，提供时忽略 serial 与 vision
         """
-        self.services = _build_services()
+        self.services = _build_services(operator or Agent(serial, vision))
         self.operator = self.services.operator
         self.market = self.services.market
         self.mail = self.services.mail
@@ -59,102 +71,143 @@ class Bot:
         self.prepare = self.services.prepare
         self.reconnect = self.services.reconnect
 
-    def detect_state(self) -> GameState:
-        """根据屏幕特征判断当前处于哪个阶段"""
+    def detect_state(self, previous: GameState = GameState.UNKNOWN) -> GameState:
+        """根据屏幕特征判断当前处于哪个阶段，优先检测 previous 的预期后继状态"""
         if self.operator.popup_handler():
-            time.sleep(1)
+            self.operator.wait_new_frame(
+                self.operator.get_frame_index(), timeout=config.STEP_INTERVAL * 5
+            )
 
         frame = self.operator.get_frame()
         if frame is None:
             return GameState.UNKNOWN
 
-        if self.operator.locate("重连入局", frame=frame):
-            logger.info("检测到重连提示")
-            return GameState.RECONNECT
-
-        if self.operator.locate("战略板", frame=frame):
-            logger.info("检测到选图界面")
-            return GameState.MAP_SELECT
-
-        if self.operator.locate("装备配置", frame=frame):
-            logger.info("检测到配装界面")
-            return GameState.PREPARE
-
-        if self.operator.locate("推荐配装", frame=frame):
-            logger.info("检测到准备界面 ")
-            return GameState.GLITCH
-
-        if self.operator.locate("行前备战", frame=frame):
-            return GameState.LOBBY
-
-        if self.operator.locate("出发", frame=frame):
-            return GameState.LOBBY_GO
+        # 预期状态的特征先在同一帧上批量匹配，未命中再匹配其余状态
+        for stage in detection_stages(previous):
+            found = self.operator.locate_many(
+                [t for state in stage for t in STATE_GRAPH[state].templates],
+                frame=frame,
+            )
+            for state in stage:
+                spec = STATE_GRAPH[state]
+                if any(found[t] for t in spec.templates):
+                    if state != previous:
+                        logger.info(f"检测到{spec.description}")
+                    return state
 
         return GameState.UNKNOWN
 
-    def run(
-        self,
-        target,
-        item_name,
-        target_price,
-        max_acceptable_price,
-        total_purchase_count,
-    ):
-        self.market.buy(
-            item_name,
-            target_price,
-            max_acceptable_price,
-            total_purchase_count,
-        )
+    def _state_handlers(self, target) -> dict[GameState, Callable[[], None]]:
+        """状态 -> 处理函数"""
+
+        def on_lobby():
+            if self.handle_mail:
+                self.round_finished = self.mail.handle_mail()
+                self.handle_mail = False
+            else:
+                self.lobby.handle_lobby_prepare()
+
+        def on_lobby_go():
+            self.lobby.handle_lobby_go()
+            self.glitch_state = True
+
+        def on_glitch():
+            self.glitch.handle_glitch(target)
+            self.glitch_state = False
+            self.handle_mail = True
+
+        return {
+            GameState.LOBBY: on_lobby,
+            GameState.MAP_SELECT: self.map.handle_map,
+            GameState.LOBBY_GO: on_lobby_go,
+            GameState.GLITCH: on_glitch,
+            GameState.RECONNECT: self.reconnect.handle_reconnect,
+            GameState.PREPARE: lambda: self.prepare.handle_prepare(self.glitch_state),
+        }
+
+    def run(self, target, orders: list[PurchaseOrder]):
+        with metrics.timer("market.buy"):
+            self.market.buy(orders)
 
         self.round_finished = False
         self.glitch_state = False
         self.handle_mail = False
-        unknown_timer = 0
+        handlers = self._state_handlers(target)
 
         # 2. 启动状态机引擎
+        previous_state = GameState.UNKNOWN
+        state_entered_at = self.operator.clock.time()
+        last_known_at = self.operator.clock.time()
+        frame_index = self.operator.get_frame_index()
+
         while not self.round_finished:
-            current_state = self.detect_state()
+            current_state = self.detect_state(previous_state)
+            now = self.operator.clock.time()
 
             if current_state != GameState.UNKNOWN:
-                unknown_timer = 0
-
-            if current_state == GameState.LOBBY:
-                if self.handle_mail:
-                    self.round_finished = self.mail.handle_mail()
-                    self.handle_mail = False
-                else:
-                    self.lobby.handle_lobby_prepare()
-
-            elif current_state == GameState.MAP_SELECT:
-                self.map.handle_map()
-
-            elif current_state == GameState.LOBBY_GO:
-                self.lobby.handle_lobby_go()
-                self.glitch_state = True
-
-            elif current_state == GameState.GLITCH:
-                self.glitch.handle_glitch(target)
-                self.glitch_state = False
-                self.handle_mail = True
-
-            elif current_state == GameState.RECONNECT:
-                self.reconnect.handle_reconnect()
-
-            elif current_state == GameState.PREPARE:
-                self.prepare.handle_prepare(self.glitch_state)
-
-            elif current_state == GameState.UNKNOWN:
-                unknown_timer += 1
-                if unknown_timer > 100:
+                last_known_at = now
+                if current_state != previous_state:
+                    logger.info(
+                        f"状态切换: {previous_state.name} -> {current_state.name}，"
+                        f"耗时 {now - state_entered_at:.2f}s"
+                    )
+                    metrics.observe(
+                        f"transition.{previous_state.name}->{current_state.name}",
+                        now - state_entered_at,
+                    )
+                    previous_state = current_state
+                    state_entered_at = now
+
+                with metrics.timer(f"state.{current_state.name}"):
+                    handlers[current_state]()
+            else:
+                spec = STATE_GRAPH.get(previous_state)
+                timeout = spec.timeout if spec else UNKNOWN_TIMEOUT
+                if now - last_known_at > timeout:
                     raise GameRebootException("状态机彻底迷失，触发全局恢复")
 
-            time.sleep(1)
+            # 画面无变化时 scrcpy 不推送新帧，最多等待 1 秒
+            _, frame_index = self.operator.wait_new_frame(frame_index, timeout=1.0)
 
-    def sell(self):
-        for _ in range(100):
+    def sell(self, rounds: int = 100):
+        """领取一次邮件、按货架空位尽量多地上架，交替执行 rounds 轮"""
+        started_at = self.operator.clock.time()
+        listed = 0
+        for _ in range(rounds):
             self.mail.recept_mail()
-            self.market.sell_all()
+            with metrics.timer("market.sell"):
+                listed += self.market.sell_all()
+
+            hours = (self.operator.clock.time() - started_at) / 3600
+            if hours > 0:
+                logger.info(f"累计上架 {listed} 组，{listed / hours:.1f} 组/小时")
+
+
+def run_buy_rounds(
+    bot: Bot,
+    run_rounds: int = 150,
+    on_round_finished: Optional[Callable[[int], None]] = None,
+):
+    """执行多轮购买流程，每轮结束后回调 on_round_finished(轮次)。"""
+    for round_num in range(1, run_rounds + 1):
+        logger.info(f"开始第 {round_num}/{run_rounds} 轮")
+        try:
+            with metrics.timer("round"):
+                bot.run(
+                    target="sheme2",
+                    orders=[PurchaseOrder(*order) for order in config.PURCHASE_ORDERS],
+                )
+        except GameRebootException as e:
+            logger.info(f"捕获异常，执行恢复: {e}")
+            metrics.incr("recoveries")
+            with metrics.timer("recovery"):
+                recovery = GameRecoveryHandler(bot.operator)
+                recovery.recover_from_failure()
+            continue
+
+        metrics.incr("rounds")
+        if on_round_finished is not None:
+            on_round_finished(round_num)
 
 
 def main(action):
@@ -166,26 +219,14 @@ def main(action):
     bot = Bot()
 
     bot.operator.start()
-
-    run_rounds = 150
+    reporter = MetricsReporter(metrics)
+    reporter.start()
+    if config.TRACE_OUTPUT:
+        tracer.enable()
 
     try:
         if action == "buy":
-            for round_num in range(1, run_rounds + 1):
-                logger.info(f"开始第 {round_num}/{run_rounds} 轮")
-                try:
-                    bot.run(
-                        target="sheme2",
-                        item_name="箭",
-                        target_price=400,
-                        max_acceptable_price=480,
-                        total_purchase_count=2000,
-                    )
-                except GameRebootException as e:
-                    logger.info(f"捕获异常，执行恢复: {e}")
-                    recovery = GameRecoveryHandler(bot.operator)
-                    recovery.recover_from_failure()
-                    continue
+            run_buy_rounds(bot)
         elif action == "sell":
             bot.sell()
     except KeyboardInterrupt:
@@ -194,6 +235,10 @@ def main(action):
         logger.info("正在清理资源...")
         caffeinate_process.terminate()
         caffeinate_process.wait()
+        reporter.stop()
+        if tracer.enabled:
+            tracer.export_chrome(config.TRACE_OUTPUT)
+            logger.info(f"已导出 trace: {config.TRACE_OUTPUT}")
         bot.operator.stop()
 
 
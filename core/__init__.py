@@ -1,3 +1,4 @@
 from .agent import Agent
+from .async_agent import AsyncAgent
 
-__all__ = ["Agent"]
+__all__ = ["Agent", "AsyncAgent"]
@@ -1,24 +1,50 @@
-import time
 import numpy as np
 from typing import Optional, Literal
 from drivers.adb_client import AdbClient
 from drivers.android_device import AndroidDeviceDriver
 from vision.engine import VisionEngine
+from vision.service import VisionClient
+from vision.ocr import TextBox, match_text
 from modules.expection import GameRebootException
 from utils.logger import logger
+from utils.metrics import metrics
+from utils.trace import traced, tracer
 from utils import config
+from utils.clock import RealClock, SimClock
+
+
+def register_ocr_targets(vision: VisionEngine | VisionClient) -> None:
+    """注册游戏内用到的 OCR 目标。"""
+    vision.register_ocr_target("count", config.count_roi, "0123456789/")
+    vision.register_ocr_target("coin", config.coin_roi, "0123456789")
+    vision.register_ocr_target("shelves", config.shelves_roi, "0123456789/")
+    vision.register_ocr_target("price", config.per_price_roi, "0123456789")
 
 
 class Agent:
 
-    def __init__(self):
-        self.android = AndroidDeviceDriver()
-        self.adb = AdbClient()
-        self.vision = VisionEngine()
-        self.vision.register_ocr_target("count", config.count_roi, "0123456789/")
-        self.vision.register_ocr_target("coin", config.coin_roi, "0123456789")
-        self.vision.register_ocr_target("shelves", config.shelves_roi, "0123456789/")
-        self.vision.register_ocr_target("price", config.per_price_roi, "0123456789")
+    def __init__(
+        self,
+        serial: Optional[str] = None,
+        vision: Optional[VisionEngine | VisionClient] = None,
+        android: Optional[AndroidDeviceDriver] = None,
+        clock: Optional[RealClock | SimClock] = None,
+        adb: Optional[AdbClient] = None,
+    ):
+        self.serial = serial
+        self.clock = clock if clock is not None else RealClock()
+        self.adb = adb if adb is not None else AdbClient(serial=serial)
+        self.android = (
+            android
+            if android is not None
+            else AndroidDeviceDriver(serial, device=self.adb.device)
+        )
+        self.vision = vision if vision is not None else VisionEngine()
+        if isinstance(self.vision, VisionClient):
+            self.vision.bind_frame_index(self.get_frame_index)
+        register_ocr_targets(self.vision)
+        # 每个 ROI 最近一次页面 OCR 的结果: roi -> (帧序号, 识别结果)
+        self._page_cache: dict[Optional[tuple[int, ...]], tuple[int, list[TextBox]]] = {}
         self.popup_targets = ["广告", "确认重连", "确认", "空白跳过", "领取跳过"]
 
     def start(self) -> None:
@@ -30,8 +56,17 @@ class Agent:
     def get_frame(self) -> Optional[np.ndarray]:
         return self.android.get_frame()
 
+    def get_frame_index(self) -> int:
+        return self.android.get_frame_index()
+
+    def wait_new_frame(
+        self, last_index: int, timeout: float = 1.0
+    ) -> tuple[Optional[np.ndarray], int]:
+        return self.android.wait_new_frame(last_index, timeout)
+
     def click(self, coord: tuple[int, int]) -> bool:
-        return self.android.click(coord)
+        with tracer.span("click", "input", coord=coord):
+            return self.android.click(coord)
 
     def touch_down(self, coord: tuple[int, int]) -> bool:
         return self.android.touch_down(coord)
@@ -40,16 +75,17 @@ class Agent:
         return self.android.touch_up(coord)
 
     def swipe(self, start_coord: tuple[int, int], end_coord: tuple[int, int]) -> bool:
-        return self.android.swipe(start_coord, end_coord)
+        with tracer.span("swipe", "input", start=start_coord, end=end_coord):
+            return self.android.swipe(start_coord, end_coord)
 
-    def restart_app(self) -> None:
-        self.adb.restart_app()
+    def restart_app(self) -> float:
+        return self.adb.restart_app()
 
-    def wifi_on(self) -> None:
-        self.adb.wifi_on()
+    def wifi_on(self) -> float:
+        return self.adb.wifi_on()
 
-    def wifi_off(self) -> None:
-        self.adb.wifi_off()
+    def wifi_off(self) -> float:
+        return self.adb.wifi_off()
 
     def read_text(
         self, target_type: str, cropped: bool = True, frame: Optional[np.ndarray] = None
@@ -60,7 +96,10 @@ class Agent:
             if frame is None:
                 return None
 
-        return self.vision.read_text(frame, target_type, cropped)
+        with metrics.timer(f"ocr.{target_type}"), tracer.span(
+            "read_text", "vision", target=target_type
+        ):
+            return self.vision.read_text(frame, target_type, cropped)
 
     def locate(
         self,
@@ -69,12 +108,85 @@ class Agent:
         ocr: bool = False,
         template_type: Optional[Literal["warehouse", "marketplace"]] = None,
     ) -> Optional[tuple[int, int]]:
+        page = None
         if frame is None:
+            if ocr and template_type is not None:
+                page = self._cached_page(
+                    self.get_frame_index(), self.get_region(template_type)
+                )
             frame = self.get_frame()
             if frame is None:
                 return None
 
-        return self.vision.locate(frame, target_name, ocr, template_type)
+        with metrics.timer("match.ocr" if ocr else "match.template"), tracer.span(
+            "locate", "vision", target=target_name, ocr=ocr
+        ):
+            return self.vision.locate(frame, target_name, ocr, template_type, page)
+
+    def locate_many(
+        self,
+        targets: list[str],
+        frame: Optional[np.ndarray] = None,
+    ) -> dict[str, Optional[tuple[int, int]]]:
+        """同一帧上批量匹配多个模板。"""
+        if frame is None:
+            frame = self.get_frame()
+            if frame is None:
+                return {target: None for target in targets}
+
+        with metrics.timer("match.batch"), tracer.span(
+            "locate_many", "vision", count=len(targets)
+        ):
+            return self.vision.locate_many(frame, targets)
+
+    def get_region(self, name: str) -> Optional[list[int]]:
+        """coords.json 中定义的文字检测区域，未定义返回 None（整帧）。"""
+        return self.vision.get_region(name)
+
+    def _cached_page(
+        self, frame_index: int, roi: Optional[list[int]]
+    ) -> Optional[list[TextBox]]:
+        cached = self._page_cache.get(tuple(roi) if roi else None)
+        if cached is not None and cached[0] == frame_index:
+            metrics.incr("ocr.page_cache_hits")
+            return cached[1]
+        return None
+
+    def read_page(
+        self, frame: Optional[np.ndarray] = None, roi: Optional[list[int]] = None
+    ) -> list[TextBox]:
+        """
+        OCR 一次（可限定在 roi 内），返回所有识别到的文字。
+
+        不传 frame 时读取当前帧，同一帧同一 roi 的结果按帧序号缓存，多次查询只检测一次。
+        """
+        frame_index = None
+        if frame is None:
+            frame_index = self.get_frame_index()
+            if (page := self._cached_page(frame_index, roi)) is not None:
+                return page
+            frame = self.get_frame()
+            if frame is None:
+                return []
+
+        with metrics.timer("ocr.page"), tracer.span("read_page", "vision"):
+            page = self.vision.read_page(frame, roi)
+        if frame_index is not None:
+            self._page_cache[tuple(roi) if roi else None] = (frame_index, page)
+        return page
+
+    def find_texts(
+        self,
+        targets: list[str],
+        roi: Optional[list[int]] = None,
+        frame: Optional[np.ndarray] = None,
+    ) -> dict[str, Optional[tuple[int, int]]]:
+        """一次页面 OCR 查找多个文字，返回 {文字: 中心坐标或 None}。"""
+        page = self.read_page(frame, roi)
+        return {
+            target: match.center if (match := match_text(page, target)) else None
+            for target in targets
+        }
 
     def if_visible(
         self,
@@ -94,20 +206,22 @@ class Agent:
 
         return False
 
+    @traced("wait_for", "wait")
     def wait_for(self, target: str, timeout: float = 10.0):
-        start_time = time.time()
+        start_time = self.clock.time()
         deadline = start_time + float(timeout)
         logger.info(f"等待目标: [{target}]")
 
-        while time.time() < deadline:
+        while self.clock.time() < deadline:
             if self.if_visible(target):
                 logger.info(f"成功找到目标: [{target}]")
                 return True
-            time.sleep(config.LOOP_INTERVAL)
+            self.clock.sleep(config.LOOP_INTERVAL)
 
         logger.warning(f"超时未找到目标: [{target}]")
         return False
 
+    @traced("wait_and_click_target", "wait")
     def wait_and_click_target(
         self,
         target: str,
@@ -115,27 +229,27 @@ class Agent:
         solve_popup: bool = False,
         next_tag: str = "",
     ) -> bool:
-        start_time = time.time()
+        start_time = self.clock.time()
         deadline = start_time + float(timeout)
         clicked = False
         last_click_time = 0.0
         retry_click_count = 0
         logger.info(f"寻找目标: [{target}]")
 
-        while time.time() < deadline:
+        while self.clock.time() < deadline:
             if solve_popup:
                 self.popup_handler()
 
             if not clicked:
                 if self.if_visible(target, do_click=True):
                     clicked = True
-                    last_click_time = time.time()
+                    last_click_time = self.clock.time()
                     if not next_tag:
                         return True
                     logger.debug(
                         f"已点击目标: [{target}]，开始验证后续状态: [{next_tag}]"
                     )
-                    time.sleep(config.STEP_INTERVAL)
+                    self.clock.sleep(config.STEP_INTERVAL)
                     continue
 
             if clicked and next_tag and self.if_visible(next_tag):
@@ -147,18 +261,18 @@ class Agent:
             if (
                 clicked
                 and next_tag
-                and time.time() - last_click_time >= config.STEP_INTERVAL * 2
+                and self.clock.time() - last_click_time >= config.STEP_INTERVAL * 2
                 and self.if_visible(target, do_click=True)
             ):
                 retry_click_count += 1
-                last_click_time = time.time()
+                last_click_time = self.clock.time()
                 logger.debug(
                     f"后续状态未出现，重试点击目标: [{target}]，第{retry_click_count}次补点"
                 )
-                time.sleep(config.STEP_INTERVAL)
+                self.clock.sleep(config.STEP_INTERVAL)
                 continue
 
-            time.sleep(config.LOOP_INTERVAL)
+            self.clock.sleep(config.LOOP_INTERVAL)
 
         if clicked and next_tag:
             logger.warning(
@@ -169,6 +283,7 @@ class Agent:
         logger.warning(f"超时未找到目标: [{target}]")
         raise GameRebootException(f"超时未找到目标: {target}")
 
+    @traced("long_press_until", "wait")
     def long_press_until(
         self,
         coords: tuple[int, int],
@@ -176,12 +291,12 @@ class Agent:
         timeout: float = 20.0,
     ) -> bool:
         logger.info(f"开始长按坐标: {coords}")
-        start_time = time.time()
+        start_time = self.clock.time()
 
         self.touch_down(coords)
 
         try:
-            while time.time() - start_time < timeout:
+            while self.clock.time() - start_time < timeout:
 
                 if self.if_visible(until_target):
                     return True
@@ -192,7 +307,7 @@ class Agent:
                     self.click(coord)
                     self.touch_down(coords)
 
-                time.sleep(config.LOOP_INTERVAL)
+                self.clock.sleep(config.LOOP_INTERVAL)
         finally:
             self.touch_up(coords)
 
@@ -209,10 +324,12 @@ class Agent:
         if frame is None:
             return False
 
+        found = self.locate_many(self.popup_targets, frame=frame)
         for target in self.popup_targets:
-            if self.if_visible(target, frame=frame, do_click=True):
+            if center := found[target]:
+                self.click(center)
                 logger.info(f"检测到弹窗: [{target}]，已自动处理")
-                time.sleep(config.STEP_INTERVAL)
+                self.clock.sleep(config.STEP_INTERVAL)
                 return True
 
         return False
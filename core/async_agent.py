@@ -0,0 +1,271 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Literal, Optional
+
+import numpy as np
+
+from core.agent import Agent, register_ocr_targets
+from modules.expection import GameRebootException
+from utils import config
+from utils.logger import logger
+from vision.engine import VisionEngine
+from vision.service import SharedFrameWriter, attach_shared_frame
+
+_process_vision: Optional[VisionEngine] = None
+_process_shms: dict[str, SharedMemory] = {}
+
+
+def _init_process_vision() -> None:
+    """进程池初始化：每个工作进程加载一份视觉引擎。"""
+    global _process_vision
+    _process_vision = VisionEngine()
+    register_ocr_targets(_process_vision)
+
+
+def _process_call(method: str, frame_spec: dict, *args):
+    assert _process_vision is not None
+    frame = attach_shared_frame(frame_spec, _process_shms, shared_tracker=True)
+    return getattr(_process_vision, method)(frame, *args)
+
+
+class _PoolVision:
+    """
+    把视觉计算转发到进程池的视觉引擎代理，其余属性（坐标、区域等）仍取本进程的引擎。
+
+    帧经共享内存传给工作进程，不随每次调用序列化；并发调用各自占用一块缓冲，用完放回。
+    """
+
+    _FORWARDED = ("locate", "locate_many", "read_text", "read_page")
+
+    def __init__(self, vision, executor: Executor, frame_index: Callable[[], int]):
+        self._vision = vision
+        self._executor = executor
+        self._frame_index = frame_index
+        self._writers: list[SharedFrameWriter] = []  # 空闲的帧缓冲
+        self._lock = threading.Lock()
+
+    def _call(self, method: str, frame, *args):
+        with self._lock:
+            writer = (
+                self._writers.pop()
+                if self._writers
+                else SharedFrameWriter(self._frame_index)
+            )
+        try:
+            spec = writer.put(frame)
+            return self._executor.submit(_process_call, method, spec, *args).result()
+        finally:
+            with self._lock:
+                self._writers.append(writer)
+
+    def close(self) -> None:
+        with self._lock:
+            for writer in self._writers:
+                writer.close()
+            self._writers.clear()
+
+    def __getattr__(self, name: str):
+        if name in self._FORWARDED:
+            return lambda *args: self._call(name, *args)
+        return getattr(self._vision, name)
+
+
+class AsyncAgent:
+    """Agent 的 asyncio 外观。
+
+    帧等待基于 scrcpy 的帧条件变量，视觉计算放入线程池或进程池执行，
+    因此同一事件循环里可以并发处理弹窗、价格轮询和导航，也可以驱动多台设备。
+    """
+
+    def __init__(
+        self,
+        agent: Optional[Agent] = None,
+        executor: Optional[Executor] = None,
+        use_processes: bool = False,
+        max_workers: int = 2,
+    ):
+        self.agent = agent or Agent()
+        self.popup_targets = self.agent.popup_targets
+        self._owns_executor = executor is None
+        if executor is None:
+            if use_processes:
+                # 调用方进程里已有 scrcpy 线程与 OCR 会话，fork 可能死锁，工作进程用 spawn 启动
+                executor = ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_process_vision,
+                )
+            else:
+                executor = ThreadPoolExecutor(
+                    max_workers=max_workers, thread_name_prefix="vision"
+                )
+        self._executor = executor
+        self._use_processes = isinstance(executor, ProcessPoolExecutor)
+        if self._use_processes:
+            # Agent 的方法在线程中执行，其中的视觉计算再交给进程池
+            self.agent.vision = _PoolVision(
+                self.agent.vision, executor, self.agent.get_frame_index
+            )
+        self._frame_index = 0
+
+    async def _run_blocking(self, func, *args):
+        """在事件循环默认线程池中执行阻塞的设备操作。"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args)
+
+    async def _run_vision(self, func, *args):
+        """执行 Agent 的视觉方法（保留其指标与 tracing）；进程池模式下在线程中等待进程池结果。"""
+        loop = asyncio.get_running_loop()
+        executor = None if self._use_processes else self._executor
+        return await loop.run_in_executor(executor, func, *args)
+
+    def start(self) -> None:
+        self.agent.start()
+
+    def stop(self) -> None:
+        self.agent.stop()
+        if self._owns_executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        if isinstance(self.agent.vision, _PoolVision):
+            self.agent.vision.close()
+
+    async def get_frame(self) -> Optional[np.ndarray]:
+        return self.agent.get_frame()
+
+    async def next_frame(self, timeout: float = 1.0) -> Optional[np.ndarray]:
+        """等待下一帧（相对上次等待到的帧），超时返回当前帧。"""
+        frame, self._frame_index = await self._run_blocking(
+            self.agent.wait_new_frame, self._frame_index, timeout
+        )
+        return frame
+
+    async def locate(
+        self,
+        target_name: str,
+        frame: Optional[np.ndarray] = None,
+        ocr: bool = False,
+        template_type: Optional[Literal["warehouse", "marketplace"]] = None,
+    ) -> Optional[tuple[int, int]]:
+        return await self._run_vision(
+            self.agent.locate, target_name, frame, ocr, template_type
+        )
+
+    async def locate_many(
+        self, targets: list[str], frame: Optional[np.ndarray] = None
+    ) -> dict[str, Optional[tuple[int, int]]]:
+        return await self._run_vision(self.agent.locate_many, targets, frame)
+
+    async def read_text(
+        self, target_type: str, cropped: bool = True, frame: Optional[np.ndarray] = None
+    ) -> Optional[str]:
+        return await self._run_vision(
+            self.agent.read_text, target_type, cropped, frame
+        )
+
+    async def click(self, coord: tuple[int, int]) -> bool:
+        return await self._run_blocking(self.agent.click, coord)
+
+    async def if_visible(
+        self,
+        target: str,
+        frame: Optional[np.ndarray] = None,
+        do_click: bool = False,
+    ) -> bool:
+        if center := await self.locate(target, frame=frame):
+            if do_click:
+                await self.click(center)
+            return True
+        return False
+
+    async def popup_handler(self, frame: Optional[np.ndarray] = None) -> bool:
+        """检测并处理弹窗，返回是否处理了弹窗。"""
+        if frame is None:
+            frame = await self.get_frame()
+        if frame is None:
+            return False
+
+        found = await self.locate_many(self.popup_targets, frame=frame)
+        for target in self.popup_targets:
+            if center := found[target]:
+                await self.click(center)
+                logger.info(f"检测到弹窗: [{target}]，已自动处理")
+                await asyncio.sleep(config.STEP_INTERVAL)
+                return True
+
+        return False
+
+    async def wait_for(self, target: str, timeout: float = 10.0) -> bool:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + float(timeout)
+        logger.info(f"等待目标: [{target}]")
+
+        while loop.time() < deadline:
+            frame = await self.next_frame(timeout=config.LOOP_INTERVAL)
+            if await self.if_visible(target, frame=frame):
+                logger.info(f"成功找到目标: [{target}]")
+                return True
+
+        logger.warning(f"超时未找到目标: [{target}]")
+        return False
+
+    async def wait_and_click_target(
+        self,
+        target: str,
+        timeout: float = 10.0,
+        solve_popup: bool = False,
+        next_tag: str = "",
+    ) -> bool:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + float(timeout)
+        clicked = False
+        last_click_time = 0.0
+        retry_click_count = 0
+        logger.info(f"寻找目标: [{target}]")
+
+        while loop.time() < deadline:
+            frame = await self.next_frame(timeout=config.LOOP_INTERVAL)
+
+            if solve_popup and await self.popup_handler(frame):
+                continue
+
+            if not clicked:
+                if await self.if_visible(target, frame=frame, do_click=True):
+                    clicked = True
+                    last_click_time = loop.time()
+                    if not next_tag:
+                        return True
+                    logger.debug(
+                        f"已点击目标: [{target}]，开始验证后续状态: [{next_tag}]"
+                    )
+                    await asyncio.sleep(config.STEP_INTERVAL)
+                continue
+
+            if next_tag and await self.if_visible(next_tag, frame=frame):
+                logger.debug(
+                    f"成功找到目标: [{target}]，并验证了后续状态: [{next_tag}]"
+                )
+                return True
+
+            if (
+                next_tag
+                and loop.time() - last_click_time >= config.STEP_INTERVAL * 2
+                and await self.if_visible(target, frame=frame, do_click=True)
+            ):
+                retry_click_count += 1
+                last_click_time = loop.time()
+                logger.debug(
+                    f"后续状态未出现，重试点击目标: [{target}]，第{retry_click_count}次补点"
+                )
+                await asyncio.sleep(config.STEP_INTERVAL)
+
+        if clicked and next_tag:
+            logger.warning(
+                f"目标已点击但后续状态未出现: [{next_tag}]，目标: [{target}]，补点次数: {retry_click_count}"
+            )
+            raise GameRebootException(f"后续状态验证超时: {next_tag}")
+
+        logger.warning(f"超时未找到目标: [{target}]")
+        raise GameRebootException(f"超时未找到目标: {target}")
@@ -1,53 +1,119 @@
-import subprocess
 import time
-from typing import List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+from adbutils import AdbDevice, AdbError, adb
+
+from utils import config
+from utils.logger import logger
+from utils.metrics import metrics
 
 
 class AdbClient:
+    """基于 adbutils 的 adb 客户端，复用与 scrcpy 相同的设备连接，不再每条命令启动 adb 进程。"""
+
+    _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="adb")
 
     def __init__(
         self,
         package_name: str = "com.tencent.tmgp.dfm",
         launch_activity: str = "com.epicgames.ue4.SplashActivity",
         serial: Optional[str] = None,
-        adb_path: str = "adb",
+        device: Optional[AdbDevice] = None,
     ):
         self.package_name = package_name
         self.launch_activity = launch_activity
         self.serial = serial
-        self.adb_path = adb_path
-
-    def _build_adb_shell_cmd(self, cmd_list: List[str]) -> List[str]:
-        full_cmd = [self.adb_path]
-        if self.serial:
-            full_cmd.extend(["-s", self.serial])
-        full_cmd.extend(["shell", *cmd_list])
-        return full_cmd
-
-    def execute_shell(self, cmd_list: List[str], timeout: int = 15) -> None:
-        """执行 adb shell 命令；失败时抛出 RuntimeError。"""
-        full_cmd = self._build_adb_shell_cmd(cmd_list)
-        try:
-            result = subprocess.run(
-                full_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                timeout=timeout,
-                text=True,
+        self._device = device
+
+    @property
+    def device(self) -> AdbDevice:
+        """绑定到 serial 的设备对象，首次访问时创建。"""
+        if self._device is None:
+            self._device = (
+                adb.device(serial=self.serial) if self.serial else adb.device_list()[0]
             )
-        except Exception as e:
+            self.serial = self._device.serial
+        return self._device
+
+    def execute_shell(self, cmd_list: List[str], timeout: int = 15) -> str:
+        """执行 adb shell 命令并返回输出；失败时抛出 RuntimeError。"""
+        start_time = time.perf_counter()
+        try:
+            result = self.device.shell2(cmd_list, timeout=timeout)
+        except (AdbError, OSError) as e:
             raise RuntimeError(f"ADB 执行异常: {e}") from e
+        finally:
+            metrics.observe(
+                f"adb.{'_'.join(cmd_list[:2])}", time.perf_counter() - start_time
+            )
 
         if result.returncode != 0:
-            error_msg = (
-                result.stderr.strip() or result.stdout.strip() or "unknown error"
-            )
-            raise RuntimeError(f"ADB 命令失败: {' '.join(full_cmd)} | {error_msg}")
+            error_msg = result.output.strip() or "unknown error"
+            raise RuntimeError(f"ADB 命令失败: {' '.join(cmd_list)} | {error_msg}")
+        return result.output
+
+    def submit(self, func: Callable[..., Any], *args: Any) -> Future:
+        """在 adb 线程池中异步执行，返回 Future。"""
+        return self._executor.submit(func, *args)
+
+    def execute_shell_async(self, cmd_list: List[str], timeout: int = 15) -> Future:
+        """异步执行 adb shell 命令。"""
+        return self.submit(self.execute_shell, cmd_list, timeout)
+
+    def _query(self, cmd: str, timeout: int = 5) -> tuple[int, str]:
+        """执行查询类命令，返回 (returncode, output)，不因非零返回码抛异常。"""
+        try:
+            result = self.device.shell2(cmd, timeout=timeout)
+        except (AdbError, OSError) as e:
+            logger.debug(f"ADB 查询失败: {cmd} | {e}")
+            return -1, ""
+        return result.returncode, result.output.strip()
 
-    def restart_app(self, wait_seconds: float = 1.0) -> None:
-        """重启应用。"""
+    def _poll(
+        self,
+        condition: Callable[[], bool],
+        timeout: float,
+        interval: float = 0.05,
+    ) -> bool:
+        """以较短间隔轮询 condition，成立立即返回 True，超时返回 False。"""
+        deadline = time.monotonic() + timeout
+        while True:
+            if condition():
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(interval)
+
+    def is_app_running(self) -> bool:
+        """应用进程是否存在。"""
+        returncode, output = self._query(f"pidof {self.package_name}")
+        return returncode == 0 and bool(output)
+
+    def is_app_resumed(self) -> bool:
+        """应用的 Activity 是否处于前台。"""
+        _, output = self._query(
+            "dumpsys activity activities | grep -E 'mResumedActivity|topResumedActivity'"
+        )
+        return self.package_name in output
+
+    def is_wifi_enabled(self) -> bool:
+        _, output = self._query("settings get global wifi_on")
+        return output not in ("", "0")
+
+    def is_network_connected(self, host: Optional[str] = None) -> bool:
+        returncode, _ = self._query(
+            f"ping -c 1 -W 1 {host or config.NETWORK_CHECK_HOST}"
+        )
+        return returncode == 0
+
+    def restart_app(self, timeout: float = 15.0) -> float:
+        """重启应用：确认进程退出后再启动，直到 Activity 回到前台。返回耗时（秒）。"""
+        start_time = time.perf_counter()
         self.execute_shell(["am", "force-stop", self.package_name])
-        time.sleep(wait_seconds)
+        if not self._poll(lambda: not self.is_app_running(), timeout):
+            logger.warning(f"应用进程 {timeout}s 内未退出")
+
         self.execute_shell(
             [
                 "am",
@@ -56,18 +122,39 @@ class AdbClient:
                 f"{self.package_name}/{self.launch_activity}",
             ]
         )
+        if not self._poll(self.is_app_resumed, timeout, interval=0.1):
+            logger.warning(f"应用 {timeout}s 内未回到前台")
 
-    def toggle_wifi(self, enable: bool) -> None:
-        """开关 WiFi。"""
+        duration = time.perf_counter() - start_time
+        metrics.observe("adb.restart_app", duration)
+        logger.info(f"应用重启完成，耗时 {duration:.2f}s")
+        return duration
+
+    def toggle_wifi(
+        self, enable: bool, wait_connected: bool = False, timeout: float = 10.0
+    ) -> float:
+        """开关 WiFi，轮询确认状态生效；开启且 wait_connected 时再等待网络连通。返回耗时（秒）。"""
+        start_time = time.perf_counter()
         if enable:
             self.execute_shell(["svc", "wifi", "enable"])
         else:
             self.execute_shell(["svc", "wifi", "disable"])
 
-    def wifi_on(self) -> None:
+        if not self._poll(lambda: self.is_wifi_enabled() == enable, timeout):
+            logger.warning(f"WiFi 状态 {timeout}s 内未切换为 {'开启' if enable else '关闭'}")
+        elif enable and wait_connected:
+            if not self._poll(self.is_network_connected, timeout, interval=0.2):
+                logger.warning(f"WiFi 已开启但 {timeout}s 内网络未连通")
+
+        duration = time.perf_counter() - start_time
+        metrics.observe(f"adb.wifi_{'on' if enable else 'off'}", duration)
+        logger.info(f"WiFi 已{'开启' if enable else '关闭'}，耗时 {duration:.2f}s")
+        return duration
+
+    def wifi_on(self, wait_connected: bool = False) -> float:
         """开启 WiFi。"""
-        self.toggle_wifi(True)
+        return self.toggle_wifi(True, wait_connected)
 
-    def wifi_off(self) -> None:
+    def wifi_off(self) -> float:
         """关闭 WiFi。"""
-        self.toggle_wifi(False)
+        return self.toggle_wifi(False)
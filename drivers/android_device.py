@@ -2,6 +2,7 @@ import time
 from typing import Optional, Tuple
 
 import numpy as np
+from adbutils import AdbDevice
 
 from .scrcpy_client import ControlSender, ScrcpyClient
 
@@ -9,8 +10,10 @@ from .scrcpy_client import ControlSender, ScrcpyClient
 class AndroidDeviceDriver:
     """Android 设备驱动（纯技术层）。"""
 
-    def __init__(self):
-        self.client = ScrcpyClient()
+    def __init__(
+        self, serial: Optional[str] = None, device: Optional[AdbDevice] = None
+    ):
+        self.client = ScrcpyClient(device_serial=serial, device=device)
 
     def start(self) -> None:
         """启动 scrcpy 客户端。"""
@@ -23,6 +26,16 @@ class AndroidDeviceDriver:
     def get_frame(self) -> Optional[np.ndarray]:
         return self.client.latest_frame
 
+    def get_frame_index(self) -> int:
+        """获取当前帧序号。"""
+        return self.client.frame_index
+
+    def wait_new_frame(
+        self, last_index: int, timeout: float = 1.0
+    ) -> Tuple[Optional[np.ndarray], int]:
+        """等待新帧到达。"""
+        return self.client.wait_for_frame(last_index, timeout)
+
     def get_control(self) -> ControlSender:
         """获取 scrcpy 控制发送器。"""
         return self.client.control
@@ -5,10 +5,12 @@ import time
 from typing import Optional, Tuple
 
 import numpy as np
-from adbutils import adb, AdbError, Network
+from adbutils import adb, AdbDevice, AdbError, Network
 from av.codec import CodecContext
 from av.error import InvalidDataError
 
+from utils.trace import tracer
+
 # --- 常量定义 ---
 ACTION_DOWN = 0
 ACTION_UP = 1
@@ -100,15 +102,19 @@ class ScrcpyClient:
         bitrate: int = 8000000,
         max_fps: int = 0,
         flip: bool = False,
+        device: Optional[AdbDevice] = None,
     ):
         self.flip = flip
         self.max_width = max_width
         self.bitrate = bitrate
         self.max_fps = max_fps
 
-        self.device = (
-            adb.device(serial=device_serial) if device_serial else adb.device_list()[0]
-        )
+        if device is not None:
+            self.device = device
+        elif device_serial:
+            self.device = adb.device(serial=device_serial)
+        else:
+            self.device = adb.device_list()[0]
 
         self.resolution: Optional[Tuple[int, int]] = None
         self.control = ControlSender(self)
@@ -196,6 +202,16 @@ class ScrcpyClient:
         with self._frame_condition:
             self._frame_condition.notify_all()
 
+    def wait_for_frame(
+        self, last_index: int, timeout: float = 1.0
+    ) -> Tuple[Optional[np.ndarray], int]:
+        """阻塞等待序号大于 last_index 的新帧，返回 (帧, 帧序号)；超时返回当前帧。"""
+        with self._frame_condition:
+            self._frame_condition.wait_for(
+                lambda: self.frame_index > last_index or not self.alive, timeout
+            )
+            return self.latest_frame, self.frame_index
+
     def __stream_loop(self):
         codec = CodecContext.create("h264", "r")
 
@@ -207,8 +223,12 @@ class ScrcpyClient:
                     break
 
                 for packet in codec.parse(raw_h264):
-                    for frame in codec.decode(packet):
-                        img_array = frame.to_ndarray(format="bgr24")
+                    with tracer.span("decode", "scrcpy", size=packet.size):
+                        frames = [
+                            frame.to_ndarray(format="bgr24")
+                            for frame in codec.decode(packet)
+                        ]
+                    for img_array in frames:
                         if self.flip:
                             img_array = np.ascontiguousarray(img_array[:, ::-1, :])
 
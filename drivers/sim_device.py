@@ -0,0 +1,301 @@
+"""
+模拟设备
+用截图组成的界面图代替真机：点击命中模板区域时切换界面，OCR ROI 返回脚本值，可注入故障。
+配合 SimClock 可以无头、确定性、高速地跑完整的状态机流程。
+
+场景文件 (JSON) 格式:
+{
+  "start": "lobby",
+  "screens": {
+    "lobby": {
+      "image": "lobby.png",
+      "transitions": {"行前备战": "map", "buy_31": {"to": "detail", "delay": 0.5}},
+      "regions": {"buy_31": [1990, 780, 2080, 840]},
+      "ocr": {"coin": ["100000", "98000"], "price": ["400"]}
+    }
+  },
+  "events": {"restart_app": "loading", "wifi_on": null, "wifi_off": null},
+  "failures": [{"screen": "reconnect", "probability": 0.01}],
+  "seed": 0
+}
+
+transitions 的键为 coords.json 中的模板名或本界面 regions 中定义的区域名；
+ocr 的值按顺序依次返回，读到最后一个后保持不变。
+下一个要返回的 OCR 值会绘制到截图的对应 ROI 上（默认取 config 中的 ROI，可用场景的
+"ocr_regions" 覆盖），脚本值变化时画面随之变化，依赖像素变化的逻辑（如价格行情缓存）也能看到。
+"""
+
+import json
+import random
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from utils import config
+from utils.logger import logger
+
+OCR_REGIONS = {
+    "count": config.count_roi,
+    "coin": config.coin_roi,
+    "shelves": config.shelves_roi,
+    "price": config.per_price_roi,
+}
+
+
+@dataclass
+class _Transition:
+    to: str
+    delay: float = 0.0
+
+
+@dataclass
+class _Screen:
+    name: str
+    image: np.ndarray
+    transitions: dict[str, _Transition] = field(default_factory=dict)
+    regions: dict[str, list[int]] = field(default_factory=dict)
+    ocr: dict[str, list[str]] = field(default_factory=dict)
+
+
+class SimDevice:
+    """实现 AndroidDeviceDriver 接口的模拟设备。"""
+
+    def __init__(
+        self,
+        scenario_file: str | Path,
+        clock,
+        coords_file: str | Path = "templates/coords.json",
+    ):
+        scenario_file = Path(scenario_file)
+        scenario = json.loads(scenario_file.read_text(encoding="utf-8"))
+        base_dir = scenario_file.parent
+
+        coords_file = Path(coords_file)
+        self.coords: dict[str, list[int]] = (
+            json.loads(coords_file.read_text(encoding="utf-8"))
+            if coords_file.exists()
+            else {}
+        )
+
+        self.screens: dict[str, _Screen] = {}
+        for name, spec in scenario["screens"].items():
+            image = cv2.imread(str(base_dir / spec["image"]))
+            if image is None:
+                raise FileNotFoundError(f"模拟界面截图不存在: {spec['image']}")
+            transitions = {}
+            for key, value in spec.get("transitions", {}).items():
+                if isinstance(value, str):
+                    transitions[key] = _Transition(value)
+                else:
+                    transitions[key] = _Transition(value["to"], value.get("delay", 0.0))
+            self.screens[name] = _Screen(
+                name=name,
+                image=image,
+                transitions=transitions,
+                regions=spec.get("regions", {}),
+                ocr={k: list(v) for k, v in spec.get("ocr", {}).items()},
+            )
+
+        self.events: dict[str, Optional[str]] = scenario.get("events", {})
+        self.failures: list[dict[str, Any]] = scenario.get("failures", [])
+        self.clock = clock
+        self._random = random.Random(scenario.get("seed", 0))
+        self._lock = threading.Lock()
+        self._ocr_cursor: dict[tuple[str, str], int] = {}
+        self.ocr_regions: dict[str, list[int]] = {
+            **OCR_REGIONS,
+            **scenario.get("ocr_regions", {}),
+        }
+        self._rendered: Optional[tuple[tuple, np.ndarray]] = None
+        self._pending: Optional[tuple[float, str]] = None
+        self.current = scenario["start"]
+        self.frame_index = 1
+        self.click_count = 0
+        self.transition_count = 0
+        self.wifi_enabled = True
+
+    # --- 界面切换 ---
+    def goto(self, screen: str) -> None:
+        """立即切换到指定界面。"""
+        if screen not in self.screens:
+            raise KeyError(f"未定义的模拟界面: {screen}")
+        with self._lock:
+            self._pending = None
+            if screen != self.current:
+                logger.debug(f"模拟设备: {self.current} -> {screen}")
+                self.current = screen
+                self.transition_count += 1
+            self.frame_index += 1
+
+    def inject(self, screen: str, delay: float = 0.0) -> None:
+        """注入故障：delay 秒后切换到指定界面（如重连提示）。"""
+        self._schedule(_Transition(screen, delay))
+
+    def trigger(self, event: str) -> None:
+        """触发设备级事件（restart_app / wifi_on / wifi_off）。"""
+        if screen := self.events.get(event):
+            self.goto(screen)
+
+    def _schedule(self, transition: _Transition) -> None:
+        if transition.delay <= 0:
+            self.goto(transition.to)
+        else:
+            self._pending = (self.clock.time() + transition.delay, transition.to)
+
+    def _update(self) -> None:
+        if self._pending is not None and self.clock.time() >= self._pending[0]:
+            self.goto(self._pending[1])
+
+    def _hit(self, coord: Tuple[int, int]) -> Optional[_Transition]:
+        screen = self.screens[self.current]
+        x, y = coord
+        for key, transition in screen.transitions.items():
+            rect = screen.regions.get(key) or self.coords.get(key)
+            if rect and rect[0] <= x <= rect[2] and rect[1] <= y <= rect[3]:
+                return transition
+        return None
+
+    def _maybe_fail(self) -> bool:
+        for failure in self.failures:
+            if self._random.random() < failure.get("probability", 0.0):
+                logger.info(f"模拟设备: 注入故障 -> {failure['screen']}")
+                self.goto(failure["screen"])
+                return True
+        return False
+
+    # --- AndroidDeviceDriver 接口 ---
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def _frame(self) -> np.ndarray:
+        """当前界面截图，叠加各 OCR ROI 上的脚本值"""
+        screen = self.screens[self.current]
+        shown = tuple(
+            (name, self._peek_text(name))
+            for name in screen.ocr
+            if name in self.ocr_regions
+        )
+        if not shown:
+            return screen.image
+        key = (self.current, shown)
+        if self._rendered is None or self._rendered[0] != key:
+            image = screen.image.copy()
+            for name, text in shown:
+                x1, y1, x2, y2 = self.ocr_regions[name]
+                image[y1:y2, x1:x2] = 255
+                cv2.putText(
+                    image, text, (x1 + 4, y2 - 8), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2
+                )
+            self._rendered = (key, image)
+        return self._rendered[1]
+
+    def get_frame(self) -> Optional[np.ndarray]:
+        self._update()
+        return self._frame()
+
+    def get_frame_index(self) -> int:
+        self._update()
+        return self.frame_index
+
+    def wait_new_frame(
+        self, last_index: int, timeout: float = 1.0
+    ) -> Tuple[Optional[np.ndarray], int]:
+        self._update()
+        if self.frame_index <= last_index:
+            if self._pending is not None:
+                self.clock.advance(min(timeout, self._pending[0] - self.clock.time()))
+            else:
+                self.clock.advance(timeout)
+            self._update()
+        return self._frame(), self.frame_index
+
+    def click(self, coord: Tuple[int, int]) -> bool:
+        self._update()
+        self.click_count += 1
+        if self._maybe_fail():
+            return True
+        if transition := self._hit(coord):
+            self._schedule(transition)
+        return True
+
+    def touch_down(self, coord: Tuple[int, int]) -> bool:
+        """按下即视为点击，长按结束条件由 transitions 的 delay 模拟。"""
+        return self.click(coord)
+
+    def touch_up(self, coord: Tuple[int, int]) -> bool:
+        return True
+
+    def swipe(self, start_coord: Tuple[int, int], end_coord: Tuple[int, int]) -> bool:
+        return True
+
+    # --- OCR 脚本 ---
+    def _peek_text(self, target_name: str) -> Optional[str]:
+        values = self.screens[self.current].ocr.get(target_name)
+        if not values:
+            return None
+        return values[self._ocr_cursor.get((self.current, target_name), 0)]
+
+    def scripted_text(self, target_name: str) -> Optional[str]:
+        """返回当前界面为 target_name 设定的下一个 OCR 结果，未设定返回 None。"""
+        values = self.screens[self.current].ocr.get(target_name)
+        if not values:
+            return None
+        key = (self.current, target_name)
+        cursor = self._ocr_cursor.get(key, 0)
+        self._ocr_cursor[key] = min(cursor + 1, len(values) - 1)
+        if values[self._ocr_cursor[key]] != values[cursor]:
+            # 下一个脚本值已绘制到画面上，算作新的一帧
+            self.frame_index += 1
+        return values[cursor]
+
+
+class SimAdbClient:
+    """实现 AdbClient 接口的模拟客户端，设备级操作转为模拟设备事件。"""
+
+    def __init__(self, device: SimDevice):
+        self.device = device
+
+    def execute_shell(self, cmd_list: list[str], timeout: int = 15) -> str:
+        logger.debug(f"模拟 adb shell: {' '.join(cmd_list)}")
+        return ""
+
+    def restart_app(self, timeout: float = 15.0) -> float:
+        self.device.trigger("restart_app")
+        return 0.0
+
+    def toggle_wifi(
+        self, enable: bool, wait_connected: bool = False, timeout: float = 10.0
+    ) -> float:
+        self.device.wifi_enabled = enable
+        self.device.trigger("wifi_on" if enable else "wifi_off")
+        return 0.0
+
+    def wifi_on(self, wait_connected: bool = False) -> float:
+        return self.toggle_wifi(True, wait_connected)
+
+    def wifi_off(self) -> float:
+        return self.toggle_wifi(False)
+
+
+class SimVision:
+    """包装视觉引擎：模板匹配照常进行，OCR 优先返回模拟设备的脚本值。"""
+
+    def __init__(self, engine, device: SimDevice):
+        self.engine = engine
+        self.device = device
+
+    def __getattr__(self, name: str):
+        return getattr(self.engine, name)
+
+    def read_text(self, frame: np.ndarray, target_name: str, cropped: bool) -> str:
+        scripted = self.device.scripted_text(target_name)
+        if scripted is not None:
+            return scripted
+        return self.engine.read_text(frame, target_name, cropped)
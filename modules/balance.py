@@ -0,0 +1,126 @@
+from typing import NamedTuple, Optional
+
+from core.agent import Agent
+from utils import config
+from utils.logger import logger
+from utils.metrics import metrics
+
+
+class Reconciliation(NamedTuple):
+    """一次余额校准的结果"""
+
+    items: int  # 上次校准以来实际成交的数量
+    unit_price: float  # 实际平均单价，未成交为 0
+
+
+class BalanceTracker:
+    """
+    哈夫币余额跟踪
+
+    用详情页的单价与购买数量预测每次购买后的余额，只在以下情况打开余额界面读取实际值校准：
+    首次购买、距上次校准已满 config.BALANCE_RECONCILE_INTERVAL 次、购买前后单价变化
+    （低价挂单被买完，实际成交价不确定）、上次校准时预测与实际偏差超过容差。
+    """
+
+    def __init__(self, operator: Agent):
+        self.operator = operator
+        self.balance: Optional[int] = None  # 上次校准读到的实际余额
+        self.predicted = 0.0
+        self._pending_count = 0  # 上次校准后预测的购买次数与数量
+        self.pending_items = 0
+        self._pending_cost = 0.0
+        self._force = True
+        self.reconciles = 0
+        self.skipped_reads = 0
+        self.divergences = 0
+
+    def read_balance(self) -> int:
+        """打开余额界面并 OCR 读取余额，失败返回 0"""
+        for _ in range(3):
+            self.operator.click(config.coin_ui)
+            self.operator.clock.sleep(0.2)
+            clean_res = self.operator.read_text("coin")
+            if clean_res:
+                money = int(clean_res)
+                if money != 0:
+                    return money
+            self.operator.clock.sleep(0.5)
+        return 0
+
+    def ensure_initialized(self) -> None:
+        if not self.balance:
+            self.balance = self.read_balance()
+            self.predicted = float(self.balance)
+
+    def record_purchase(self, count: int, unit_price: int) -> None:
+        """记录一次按 unit_price 预测的购买"""
+        cost = count * unit_price
+        self.predicted -= cost
+        self._pending_count += 1
+        self.pending_items += count
+        self._pending_cost += cost
+
+    def needs_reconcile(self, price_changed: bool = False) -> bool:
+        return (
+            self._force
+            or price_changed
+            or self._pending_count >= config.BALANCE_RECONCILE_INTERVAL
+        )
+
+    def expected_unit_price(self) -> float:
+        """上次校准以来按显示价格预测的平均单价"""
+        return self._pending_cost / self.pending_items if self.pending_items else 0.0
+
+    def skip(self) -> None:
+        """本次购买不读余额，直接采用预测值"""
+        self.skipped_reads += 1
+        metrics.incr("balance.skipped_reads")
+
+    def reconcile(self) -> Optional[Reconciliation]:
+        """
+        读取实际余额并与预测值比对
+
+        Returns:
+            上次校准以来实际成交的数量与平均单价；读取失败或此前没有余额可比对时返回 None
+        """
+        observed = self.read_balance()
+        items, predicted_cost = self.pending_items, self._pending_cost
+        if observed == 0:
+            # 读取失败，保留未校准的预测，下次购买再校准
+            logger.warning("余额读取失败，沿用预测值")
+            self._force = True
+            return None
+
+        previous = self.balance
+        self._pending_count = self.pending_items = 0
+        self._pending_cost = 0.0
+        self.reconciles += 1
+        metrics.incr("balance.reconciles")
+        if not previous:
+            # 之前没有读到过余额，无从比对
+            self.balance = observed
+            self.predicted = float(observed)
+            self._force = False
+            return None
+
+        cost = previous - observed
+        error = abs(cost - predicted_cost) / max(predicted_cost, 1.0)
+        self._force = error > config.BALANCE_TOLERANCE
+        if self._force:
+            self.divergences += 1
+            metrics.incr("balance.divergences")
+
+        logger.info(
+            f"余额校准: 预测 {self.predicted:.0f}, 实际 {observed}, 偏差 {error:.1%} "
+            f"(校准 {self.reconciles} 次, 省去读取 {self.skipped_reads} 次, 偏差过大 {self.divergences} 次)"
+        )
+        self.balance = observed
+        self.predicted = float(observed)
+
+        if cost <= 0 or items == 0:
+            return Reconciliation(0, 0.0)
+        # 成交数量按余额减少量 / 显示单价估计，不超过已点击购买的数量
+        filled = min(items, round(cost * items / predicted_cost))
+        if filled <= 0:
+            return Reconciliation(0, 0.0)
+        return Reconciliation(filled, cost / filled)
@@ -1,4 +1,3 @@
-import time
 from utils.logger import logger
 import utils.config as config
 from core.agent import Agent
@@ -15,12 +14,12 @@ class GlitchHandler:
             coords = self.vision.get_template_coords(target)
             if coords is not None:
                 self.operator.click(coords)
-            time.sleep(0.2)
+            self.operator.clock.sleep(0.2)
 
-        time.sleep(10)
+        self.operator.clock.sleep(config.GLITCH_WIFI_DELAY)
         self.operator.wifi_on()
 
         self.operator.long_press_until(config.syfa, "重连入局")
-        time.sleep(4)
+        self.operator.clock.sleep(4)
         self.operator.wait_and_click_target("取消重连")
         self.operator.wait_and_click_target("放弃对局")
@@ -1,5 +1,5 @@
-import time
 from core.agent import Agent
+from utils import config
 from utils.logger import logger
 
 
@@ -14,5 +14,5 @@ class LobbyHandler:
     def handle_lobby_go(self):
         logger.info("【状态】大厅 -> 出发")
         self.operator.wait_and_click_target("出发")
-        time.sleep(6)
+        self.operator.clock.sleep(config.MATCH_COMMIT_DELAY)
         self.operator.restart_app()
@@ -1,4 +1,3 @@
-import time
 from core.agent import Agent
 from utils.logger import logger
 
@@ -11,7 +10,7 @@ class MailHandler:
         logger.info("【状态】处理邮件与收尾")
         self.operator.wait_and_click_target("邮件")
         self.operator.wait_for("部分领取")
-        time.sleep(0.5)
+        self.operator.clock.sleep(0.5)
         frame = self.operator.get_frame()
         if frame is None:
             return
@@ -21,11 +20,11 @@ class MailHandler:
         )
         if allright:
             self.operator.wait_and_click_target("部分领取")
-            time.sleep(0.5)
+            self.operator.clock.sleep(0.5)
             self.operator.wait_and_click_target("胸挂")
             self.operator.wait_and_click_target("背包")
         self.operator.wait_and_click_target("领取")
-        time.sleep(1)
+        self.operator.clock.sleep(1)
         self.operator.wait_and_click_target("返回", solve_popup=True)
 
         return True
@@ -35,9 +34,9 @@ class MailHandler:
 
         self.operator.wait_and_click_target("邮件")
         self.operator.wait_and_click_target("系统")
-        time.sleep(2)
+        self.operator.clock.sleep(2)
         self.operator.wait_and_click_target("领取")
-        time.sleep(2)
+        self.operator.clock.sleep(2)
         self.operator.popup_handler()
         if self.operator.if_visible("删除"):
             self.operator.wait_and_click_target("删除", solve_popup=True)
@@ -1,4 +1,3 @@
-import time
 from core.agent import Agent
 from utils.logger import logger
 
@@ -9,7 +8,7 @@ class MapHandler:
 
     def handle_map(self):
         logger.info("【状态】选图 -> 进入配装")
-        time.sleep(1)
+        self.operator.clock.sleep(1)
         if self.operator.if_visible("开始行动", do_click=True):
             return
         self.operator.wait_and_click_target(
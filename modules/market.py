@@ -1,39 +1,119 @@
-import time
 from utils import config
 import re
-from typing import Tuple, Optional
+from dataclasses import dataclass
+from typing import Callable, Tuple, Optional
+
+import numpy as np
 from utils.logger import logger
+from utils.metrics import metrics
+from utils.price_history import price_history
 from core.agent import Agent
+from modules.balance import BalanceTracker
 from modules.expection import GameRebootException
+from modules.slider import SliderController
+from modules.strategy import WAIT, Fill, PurchaseContext, create_strategy
+from modules.ticker import PriceTicker
+from modules.warehouse import WarehouseIndex
+
+
+@dataclass
+class PurchaseOrder:
+    """一个物品的购买目标"""
+
+    item_name: str
+    target_price: int
+    max_acceptable_price: int
+    total_purchase_count: int
+    purchased: int = 0  # 已有数量（仓库库存 + 本次已购买）
+
+    @property
+    def done(self) -> bool:
+        return self.purchased >= self.total_purchase_count
 
 
 class MarketHandler:
     def __init__(self, operator: Agent):
         self.operator = operator
-        self.total_purchased = 0
-        self.total_purchase_count = 0
-        self.current_money = 0
-        self.target_coord = None
-
-    def _shelves_slot(self) -> bool:
-        clean_res = self.operator.read_text("shelves")
+        self.order = PurchaseOrder("", 0, 0, 0)
+        self.balance = BalanceTracker(operator)
+        self.ticker = PriceTicker(operator)
+        self.warehouse = WarehouseIndex(operator)
+        self.slider = SliderController(operator, self._get_inventory_count)
+        self.strategy = create_strategy()
+        # 各物品在交易行页面上的位置，跨轮次复用
+        self.target_coords: dict[str, Tuple[int, int]] = {}
+        self._last_price: Optional[int] = None
+        # 上次余额校准后按点击计入的购买 (订单, 数量)，校准时按实际成交数量修正
+        self._unreconciled: list[Tuple[PurchaseOrder, int]] = []
+
+    @property
+    def item_name(self) -> str:
+        return self.order.item_name
+
+    def _shelves_usage(
+        self, frame: Optional[np.ndarray] = None
+    ) -> Optional[Tuple[int, int]]:
+        """读取货架 已用/总数，读不到返回 None"""
+        clean_res = self.operator.read_text("shelves", frame=frame)
         if clean_res:
             pattern = re.compile(r"(\d+)\s*[\/|]\s*(\d+)")
             match = pattern.search(clean_res)
             if match:
-                if int(match.group(1)) == 0:
-                    return True
-        return False
+                used, total = int(match.group(1)), int(match.group(2))
+                if total != 0:
+                    return used, total
+        return None
+
+    def _free_slots(self) -> int:
+        if usage := self._shelves_usage():
+            used, total = usage
+            return max(total - used, 0)
+        return 0
+
+    def _wait_shelves(
+        self, condition: Callable[[int, int], bool], timeout: float
+    ) -> int:
+        """
+        等待货架 (已用, 总数) 满足 condition，返回此时的空位数，超时返回 0
+
+        只在画面变化（有新帧）时重新读取，不按固定间隔轮询。
+        """
+        clock = self.operator.clock
+        deadline = clock.time() + timeout
+        frame_index = self.operator.get_frame_index()
+        frame = self.operator.get_frame()
+        read_index = None
+
+        while True:
+            if frame is not None and frame_index != read_index:
+                read_index = frame_index
+                if usage := self._shelves_usage(frame):
+                    used, total = usage
+                    if condition(used, total):
+                        return max(total - used, 0)
+
+            remaining = deadline - clock.time()
+            if remaining <= 0:
+                logger.info(f"{timeout:.0f}s 内货架状态未变化")
+                return 0
+            frame, frame_index = self.operator.wait_new_frame(
+                frame_index, timeout=min(remaining, 1.0)
+            )
 
     def _get_current_price(self) -> int:
+        """重试读取当前单价，读不到（挂单已被买空）返回 0"""
         for _ in range(3):
             clean_res = self.operator.read_text("price")
             if clean_res:
                 price = int(clean_res)
                 if price != 0:
                     return price
-            time.sleep(0.5)
-        raise GameRebootException("无法获取当前价格")
+            self.operator.clock.sleep(0.5)
+        return 0
+
+    def _peek_price(self) -> int:
+        """读取一次当前单价，读不到返回 0"""
+        return self.ticker.read()
 
     def _get_inventory_count(self) -> Tuple[int, int]:
         for _ in range(3):
@@ -45,22 +125,10 @@ class MarketHandler:
                     current_val, total_val = int(match.group(1)), int(match.group(2))
                     if total_val != 0 and current_val != 0:
                         return (current_val, total_val)
-            time.sleep(0.5)
+            self.operator.clock.sleep(0.5)
         raise GameRebootException("无法获取库存数量")
 
-    def _get_current_money(self) -> int:
-        for _ in range(3):
-            self.operator.click(config.coin_ui)
-            time.sleep(0.2)
-            clean_res = self.operator.read_text("coin")
-            if clean_res:
-                final_money = int(clean_res)
-                if final_money != 0:
-                    return final_money
-            time.sleep(0.5)
-        return 0
-
-    def _get_unit_price(self, count):
+    def _get_unit_price(self, count) -> Fill:
         logger.info(f"尝试购买 {count} 个...")
 
         if count == 31:
@@ -69,224 +137,307 @@ class MarketHandler:
             buy_btn = config.buy_200
         else:
             logger.error(f"不支持的购买数量: {count}")
-            return 0
+            return Fill(0, 0, False)
 
-        if self.current_money == 0:
-            self.current_money = self._get_current_money()
+        self.balance.ensure_initialized()
 
         for _ in range(3):
+            price = self._last_price or self._peek_price()
+            if not price:
+                # 挂单已被买空（读不到价格），结束本次购买，由策略决定离开详情页
+                logger.info(f"{self.item_name} 读不到当前价格，停止购买")
+                return Fill(0, 0, False)
             self.operator.click(buy_btn)
-            time.sleep(0.2)
+            self.operator.clock.sleep(0.2)
             self.operator.click(config.buy_confirm)
-            time.sleep(0.2)
-
-            new_money = self._get_current_money()
-
-            cost = self.current_money - new_money
-            self.current_money = new_money
-            actual_unit_price = cost / count
-
-            if actual_unit_price != 0:
-                self.total_purchased += count
-                logger.info(
-                    f"购买数量: {self.total_purchased} / {self.total_purchase_count}"
-                )
-                return actual_unit_price
-
-        return 0
-
-    def _search_category(
-        self, category_index: int, item_name: str
-    ) -> Optional[Tuple[int, int]]:
-        y = 1070 - 130 * category_index
-        self.operator.click((2460, y))
-        time.sleep(0.5)
-
-        if coord := self.operator.locate(
-            item_name, ocr=True, template_type="warehouse"
-        ):
-            return coord
-
-        self.operator.swipe((1900, 800), (1900, 600))
-
-        if coord := self.operator.locate(
-            item_name, ocr=True, template_type="warehouse"
-        ):
-            return coord
-
-        return None
+            self.operator.clock.sleep(0.2)
+
+            self.balance.record_purchase(count, price)
+            self._unreconciled.append((self.order, count))
+            self.order.purchased += count
+            metrics.incr("market.items_bought", count)
+
+            # 单价变化说明低价挂单已被买完，实际成交价需要读余额确认
+            price_after = self._peek_price()
+            self._last_price = price_after or None
+            if self.balance.needs_reconcile(price_changed=price_after != price):
+                expected = self.balance.expected_unit_price()
+                result = self.balance.reconcile()
+                if result is None:
+                    if self.balance.pending_items == 0:
+                        # 首次读到余额，无从比对，按点击数量计入
+                        self._unreconciled.clear()
+                    return Fill(price, price, False)
+
+                self._settle(result.items)
+                if result.items:
+                    price_history.record(
+                        self.item_name,
+                        "probe" if count == 31 else "bulk",
+                        result.unit_price,
+                        reference=expected,
+                    )
+                    self._log_progress()
+                    return Fill(result.unit_price, price, True)
+            else:
+                self.balance.skip()
+                self._log_progress()
+                return Fill(price, price, False)
+
+        return Fill(0, 0, True)
+
+    def _settle(self, filled: int) -> None:
+        """
+        按余额校准得到的实际成交数量修正各订单的已购数量
+
+        未成交的数量从最近的购买开始扣除（挂单被抢时通常是最后几次购买落空）。
+        """
+        missing = sum(count for _, count in self._unreconciled) - filled
+        while missing > 0 and self._unreconciled:
+            order, count = self._unreconciled.pop()
+            rollback = min(count, missing)
+            order.purchased -= rollback
+            missing -= rollback
+            metrics.incr("market.items_bought", -rollback)
+            logger.info(f"{order.item_name} 有 {rollback} 个未成交，已从购买数量中扣除")
+        self._unreconciled.clear()
+
+    def _log_progress(self) -> None:
+        logger.info(
+            f"{self.item_name} 购买数量: {self.order.purchased} / {self.order.total_purchase_count}"
+        )
 
-    def _search_warehouse(self, item_name: str) -> Optional[Tuple[int, int]]:
+    def _sort_warehouse(self):
         self.operator.wait_and_click_target("整理")
         self.operator.wait_and_click_target("确认整理")
+        self.warehouse.reset_view()
 
         self.operator.swipe((2460, 950), (2460, 650))
-        time.sleep(0.5)
+        self.operator.clock.sleep(0.5)
 
-        for category_index in range(4):
-            if coord := self._search_category(category_index, item_name):
-                return coord
+    def _find_in_warehouse(self, item_name: str) -> Optional[Tuple[int, int]]:
+        with metrics.timer("market.warehouse_search"):
+            return self.warehouse.find(item_name)
 
-        logger.warning(f"在仓库中未找到物品: {item_name}")
-        return None
+    def _search_warehouse(self, item_name: str) -> Optional[Tuple[int, int]]:
+        self._sort_warehouse()
+        return self._find_in_warehouse(item_name)
 
-    def _get_inventory(self, item_name) -> int:
+    def _get_inventories(self, item_names: list[str]) -> dict[str, int]:
+        """进入一次仓库，依次读取各物品的库存数量"""
         self.operator.wait_and_click_target("交易行")
-        total_val = 0
+        inventories = dict.fromkeys(item_names, 0)
         self.operator.wait_and_click_target("出售")
-        if coord := self._search_warehouse(item_name):
-            self.operator.click(coord)
-            time.sleep(2)
-
-            if res := self._get_inventory_count():
-                _, total_val = res
-                logger.info(f"总数量: {total_val}")
-
-                time.sleep(0.2)
-                self.operator.wait_and_click_target("取消")
-        time.sleep(0.2)
+        self._sort_warehouse()
+        for item_name in item_names:
+            if coord := self._find_in_warehouse(item_name):
+                self.operator.click(coord)
+                self.operator.clock.sleep(2)
+
+                if res := self._get_inventory_count():
+                    _, total_val = res
+                    inventories[item_name] = total_val
+                    logger.info(f"{item_name} 总数量: {total_val}")
+
+                    self.operator.clock.sleep(0.2)
+                    self.operator.wait_and_click_target("取消")
+        self.operator.clock.sleep(0.2)
         self.operator.wait_and_click_target("返回")
-        return total_val
-
-    def _init_buy_session(
-        self,
-        item_name: str,
-        target_price: int,
-        max_acceptable_price: int,
-        total_purchase_count: int,
-    ):
-        self.total_purchased = 0
-        self.total_purchase_count = total_purchase_count
-
-        logger.info(f"开始购买商品: {item_name}")
-        logger.info(
-            f"目标价格: {target_price}, 最大可接受价格: {max_acceptable_price}, 目标数量: {self.total_purchase_count}"
-        )
+        return inventories
+
+    def _init_buy_session(self, orders: list[PurchaseOrder]):
+        for order in orders:
+            logger.info(f"开始购买商品: {order.item_name}")
+            logger.info(
+                f"目标价格: {order.target_price}, 最大可接受价格: {order.max_acceptable_price}, 目标数量: {order.total_purchase_count}"
+            )
 
-        self.total_purchased += self._get_inventory(item_name)
+        with metrics.timer("market.inventory"):
+            inventories = self._get_inventories([order.item_name for order in orders])
+        for order in orders:
+            order.purchased = inventories[order.item_name]
         self.operator.wait_and_click_target("交易行", next_tag="交易行页面")
 
+        # 一次页面 OCR 定位所有尚未缓存坐标的物品，找不到的进入详情页时再逐个定位
+        if missing := [
+            order.item_name
+            for order in orders
+            if order.item_name not in self.target_coords
+        ]:
+            found = self.operator.find_texts(
+                missing, roi=self.operator.get_region("marketplace")
+            )
+            self.target_coords.update(
+                {name: coord for name, coord in found.items() if coord}
+            )
+
     def _enter_market_item(self, item_name: str):
         for _ in range(3):
-            if self.target_coord is None:
+            coord = self.target_coords.get(item_name)
+            if coord is None:
                 if coord := self.operator.locate(
                     item_name, ocr=True, template_type="marketplace"
                 ):
-                    self.target_coord = coord
-                    self.operator.click(self.target_coord)
+                    self.target_coords[item_name] = coord
                 else:
                     continue
-            else:
-                self.operator.click(self.target_coord)
+            self.operator.click(coord)
 
             if self.operator.wait_for("兑换", timeout=1):
                 return
 
-            time.sleep(1)
+            self.operator.clock.sleep(1)
 
         raise GameRebootException(f"无法进入物品详情页: {item_name}")
 
     def _handle_preview_price(self, max_acceptable_price: int) -> bool:
         preview_price = self._get_current_price()
+        if not preview_price:
+            logger.info(f"{self.item_name} 读不到预检价格（挂单可能已被买空），返回刷新")
+            self._leave_market_detail()
+            return False
+        price_history.record(self.item_name, "preview", preview_price)
 
-        if preview_price > max_acceptable_price or preview_price == 0:
+        if preview_price > max_acceptable_price:
+            # 留在详情页逐帧盯价，价格一降到可接受范围立即购买
             logger.info(
-                f"预检价格 {preview_price} 高于可接受价格 {max_acceptable_price}，返回刷新"
+                f"预检价格 {preview_price} 高于可接受价格 {max_acceptable_price}，盯价中"
             )
-            self._leave_market_detail()
-            return False
+            with metrics.timer("market.watch"):
+                preview_price = self.ticker.watch(
+                    max_acceptable_price,
+                    config.TICKER_WATCH_TIMEOUT,
+                    on_tick=self._record_tick,
+                )
+            if preview_price is None:
+                logger.info(f"{config.TICKER_WATCH_TIMEOUT}s 内价格未回落，返回刷新")
+                self._leave_market_detail()
+                return False
+            logger.info(f"价格回落到 {preview_price}，立即购买")
 
+        self._last_price = preview_price
         return True
 
-    def _try_probe_and_bulk_buy(self, target_price: int):
-        price_31 = self._get_unit_price(31)
-        logger.info(f"单价: {price_31}")
+    def _record_tick(self, timestamp: float, price: int) -> None:
+        history = self.ticker.history
+        if len(history) < 2 or history[-2][1] != price:
+            price_history.record(self.item_name, "tick", price)
+
+    def _run_strategy(self, target_price: int):
+        """在详情页内按购买策略逐次购买，直到策略决定离开或买够数量"""
+        self.strategy.reset(self.item_name)
+        while not self.order.done:
+            ctx = PurchaseContext(
+                item_name=self.item_name,
+                target_price=target_price,
+                displayed_price=self._last_price or self._peek_price(),
+                remaining=self.order.total_purchase_count - self.order.purchased,
+            )
+            quantity = self.strategy.next_quantity(ctx)
+            if quantity == 0:
+                return
+            if quantity == WAIT:
+                with metrics.timer("market.watch"):
+                    price = self.ticker.watch(
+                        self.strategy.watch_price(ctx),
+                        config.TICKER_WATCH_TIMEOUT,
+                        on_tick=self._record_tick,
+                    )
+                if price is None:
+                    return
+                self._last_price = price
+                continue
 
-        if price_31 <= target_price and price_31 > 0:
-            while True:
-                price_200 = self._get_unit_price(200)
-                logger.info(f"批量购买单价: {price_200}")
+            with metrics.timer("market.probe" if quantity == 31 else "market.bulk"):
+                fill = self._get_unit_price(quantity)
+            logger.info(f"购买 {quantity} 个，单价: {fill.unit_price}")
+            self.strategy.observe(quantity, fill)
 
-                if price_200 > target_price or price_200 == 0:
-                    logger.info("价格上涨，跳回探测模式")
-                    break
-            return
+    def _leave_market_detail(self):
+        self._last_price = None
+        self.ticker.reset()
+        with metrics.timer("market.leave_detail"):
+            self.operator.wait_and_click_target("返回", next_tag="交易行页面")
 
-        logger.info(f"探测价格 {price_31} 高于目标价格 {target_price}，继续探测")
+    def _visit_item(self, order: PurchaseOrder):
+        """进入一次物品详情页购买，价格不合适或策略结束后回到交易行页面"""
+        self.order = order
+        self._enter_market_item(order.item_name)
 
-    def _leave_market_detail(self):
-        self.operator.wait_and_click_target("返回", next_tag="交易行页面")
-
-    def buy(
-        self,
-        item_name: str,
-        target_price: int,
-        max_acceptable_price: int,
-        total_purchase_count: int,
-    ):
-        self._init_buy_session(
-            item_name,
-            target_price,
-            max_acceptable_price,
-            total_purchase_count,
-        )
+        if not self._handle_preview_price(order.max_acceptable_price):
+            return
 
-        while self.total_purchased < self.total_purchase_count:
-            self._enter_market_item(item_name)
+        self._run_strategy(order.target_price)
+        self._leave_market_detail()
 
-            if not self._handle_preview_price(max_acceptable_price):
-                continue
+    def buy(self, orders: list[PurchaseOrder]):
+        """
+        在一次交易行会话内购买多个物品
 
-            self._try_probe_and_bulk_buy(target_price)
-            self._leave_market_detail()
+        仓库库存只进入一次统一读取；之后在各物品详情页之间轮流进出，
+        某个物品价格不合适时先去买下一个，直到全部买够数量再离开交易行。
+        """
+        self._init_buy_session(orders)
+
+        while pending := [order for order in orders if not order.done]:
+            for order in pending:
+                self._visit_item(order)
 
         self.operator.wait_and_click_target("返回")
 
-    def sell_all(self, item_name: str = "T46M"):
-        """出售所有物品"""
-        self.operator.wait_and_click_target("交易行")
+    def _list_item(self, item_name: str) -> bool:
+        """在出售页上架一组物品，仓库中没有该物品或数量调整失败时返回 False"""
+        coord = self._find_in_warehouse(item_name)
+        if coord is None:
+            return False
 
-        self.operator.wait_and_click_target("出售")
-        time.sleep(0.2)
+        used_before = self._shelves_usage()
+        self.operator.click(coord)
+        self.operator.wait_for("上架2")
 
-        if coord := self._search_warehouse(item_name):
-            self.operator.click(coord)
-            self.operator.wait_for("上架2")
-            x1, x2, y = config.slider_end
-
-            time.sleep(3)
-            if res := self._get_inventory_count():
-                current_val, total_val = res
-                logger.info(f"物品数量: {current_val}/{total_val}")
-                if total_val == 0:
-                    return
-                time.sleep(1)
-                x = int(x1 + (x2 - x1) * min((3000 / total_val), 1))
-                logger.debug(f"滑动到位置: ({x}, {y})")
-                self.operator.click((x, y))
+        self.operator.clock.sleep(3)
+        current_val, total_val = self._get_inventory_count()
+        logger.info(f"物品数量: {current_val}/{total_val}")
+        if self.slider.set_quantity(item_name, config.SELL_QUANTITY, total_val) is None:
+            self.operator.wait_and_click_target("取消")
+            self.operator.clock.sleep(0.2)
+            return False
 
-            time.sleep(1)
+        self.operator.wait_and_click_target("上架2")
+        if used_before is not None:
+            # 货架占用数增加说明上架完成，回到出售页
+            self._wait_shelves(lambda used, _: used > used_before[0], timeout=5.0)
+        else:
+            self.operator.clock.sleep(3)
 
-            if res := self._get_inventory_count():
-                current_val, total_val = res
+        metrics.incr("sell.listings")
+        return True
 
-                if total_val > 3000:
-                    click_count = abs(current_val - 3000)
-                    if current_val > 3000:
-                        for _ in range(click_count):
-                            self.operator.click((config.slider_end[0] - 60, y))
-                            time.sleep(0.01)
-                    elif current_val < 3000:
-                        for _ in range(click_count):
-                            self.operator.click((config.slider_end[1] + 60, y))
-                            time.sleep(0.01)
+    def sell_all(self, item_name: str = "T46M") -> int:
+        """
+        进入一次出售页，按货架空位尽量多地上架
 
-                time.sleep(0.2)
+        货架已满时留在出售页等待空位（最多 config.SELL_SLOT_TIMEOUT 秒）。
 
-            self.operator.wait_and_click_target("上架2")
+        Returns:
+            本次上架的组数
+        """
+        self.operator.wait_and_click_target("交易行")
+
+        self.operator.wait_and_click_target("出售")
+        self.operator.clock.sleep(0.2)
+        self._sort_warehouse()
 
-            time.sleep(3)
-            while not self._shelves_slot():
-                time.sleep(1)
+        listed = 0
+        free = self._wait_shelves(
+            lambda used, total: used < total, timeout=config.SELL_SLOT_TIMEOUT
+        )
+        while free > 0:
+            if not self._list_item(item_name):
+                break
+            listed += 1
+            free = self._free_slots()
 
+        logger.info(f"本次上架 {listed} 组")
         self.operator.wait_and_click_target("返回")
+        return listed
@@ -1,6 +1,5 @@
 from core.agent import Agent
 from utils.logger import logger
-import time
 
 
 class PrepareHandler:
@@ -15,5 +14,5 @@ class PrepareHandler:
             )
         else:
             self.operator.wait_and_click_target("确认配装", next_tag="再次确认配装")
-            time.sleep(0.2)
+            self.operator.clock.sleep(0.2)
             self.operator.wait_and_click_target("再次确认配装", next_tag="出发")
@@ -0,0 +1,134 @@
+import math
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+from core.agent import Agent
+from utils import config
+from utils.logger import logger
+from utils.metrics import metrics
+
+NUDGE_OFFSET = 60  # 滑条两端 -/+ 按钮相对滑条端点的距离
+
+
+class SliderController:
+    """
+    上架数量滑条
+
+    数量与滑条位置近似成正比：把 数量 / 总数 看作滑条 x 坐标的线性函数，
+    按物品记录每次点击后读到的数量做最小二乘拟合（只有一个读数时沿用默认斜率做割线修正），
+    先按拟合结果点击目标位置，拟合结果与上次位置相同时向目标方向移动一个像素，
+    最多移动 config.SLIDER_MAX_MOVES 次；回到最接近目标的位置后，
+    剩余的差值（不超过半个像素对应的数量，至少允许 config.SLIDER_MAX_NUDGES 个）用 -/+ 按钮逐个补齐，
+    仍未达到目标数量时放弃本次上架。
+    """
+
+    def __init__(self, operator: Agent, read_count: Callable[[], Tuple[int, int]]):
+        self.operator = operator
+        self.read_count = read_count
+        # 物品 -> [(x, 数量 / 总数)]
+        self.observations: dict[str, list[tuple[int, float]]] = {}
+        self.clicks = 0
+        self.reads = 0
+
+    def _fit(self, item_name: str) -> Tuple[float, float]:
+        """返回 数量 / 总数 = slope * x + intercept 的 (slope, intercept)"""
+        x1, x2, _ = config.slider_end
+        slope = 1.0 / (x2 - x1)
+        points = self.observations.get(item_name, [])[-8:]
+        if len({x for x, _ in points}) >= 2:
+            xs, fractions = np.array(points, dtype=np.float64).T
+            fitted_slope, intercept = np.polyfit(xs, fractions, 1)
+            if fitted_slope > 0:
+                return float(fitted_slope), float(intercept)
+        if points:
+            x, fraction = points[-1]
+            return slope, fraction - slope * x
+        return slope, -slope * x1
+
+    def _target_x(self, item_name: str, fraction: float) -> int:
+        x1, x2, _ = config.slider_end
+        slope, intercept = self._fit(item_name)
+        return int(round(min(max((fraction - intercept) / slope, x1), x2)))
+
+    def _click(self, coord: Tuple[int, int]) -> None:
+        self.operator.click(coord)
+        self.clicks += 1
+
+    def _read(self, item_name: str, x: Optional[int]) -> Tuple[int, int]:
+        current, total = self.read_count()
+        self.reads += 1
+        if x is not None:
+            self.observations.setdefault(item_name, []).append((x, current / total))
+        return current, total
+
+    def set_quantity(self, item_name: str, quantity: int, total: int) -> Optional[int]:
+        """
+        把上架数量调整到 quantity（总数不足时拉满）
+
+        Returns:
+            调整后读到的数量；未能调整到 quantity 时返回 None，由调用方取消上架
+        """
+        x1, x2, y = config.slider_end
+        self.clicks = 0
+        self.reads = 0
+
+        if total <= quantity:
+            self._click((x2, y))
+            self.operator.clock.sleep(0.2)
+            self._report(item_name)
+            return total
+
+        current = 0
+        last_x = None
+        nudge_limit = config.SLIDER_MAX_NUDGES
+        tried: dict[int, int] = {}  # x -> 读到的数量
+        for _ in range(config.SLIDER_MAX_MOVES):
+            x = self._target_x(item_name, quantity / total)
+            if x in tried:
+                # 拟合结果落在已试过的位置，向目标方向移动一个像素
+                x += 1 if tried[x] < quantity else -1
+                if x in tried or not x1 <= x <= x2:
+                    break
+            logger.debug(f"滑动到位置: ({x}, {y})")
+            self._click((x, y))
+            self.operator.clock.sleep(0.5)
+            current, total = self._read(item_name, x)
+            tried[x] = current
+            last_x = x
+
+            slope, _ = self._fit(item_name)
+            # 最接近目标的像素与目标相差不超过半个像素对应的数量，这部分用 -/+ 按钮补齐
+            nudge_limit = max(config.SLIDER_MAX_NUDGES, math.ceil(slope * total / 2))
+            if abs(current - quantity) <= nudge_limit:
+                break
+
+        best_x = min(tried, key=lambda x: abs(tried[x] - quantity), default=None)
+        if best_x is not None and best_x != last_x:
+            self._click((best_x, y))
+            self.operator.clock.sleep(0.5)
+            current, total = self._read(item_name, best_x)
+
+        for _ in range(2):
+            diff = quantity - current
+            if diff == 0 or abs(diff) > nudge_limit:
+                break
+            nudge = (x2 + NUDGE_OFFSET, y) if diff > 0 else (x1 - NUDGE_OFFSET, y)
+            for _ in range(abs(diff)):
+                self._click(nudge)
+                self.operator.clock.sleep(0.01)
+            self.operator.clock.sleep(0.2)
+            current, total = self._read(item_name, None)
+
+        self._report(item_name)
+        if current != quantity:
+            logger.warning(f"{item_name} 上架数量 {current} 未能调整到目标 {quantity}")
+            metrics.incr("sell.slider_failed")
+            return None
+        return current
+
+    def _report(self, item_name: str) -> None:
+        logger.info(f"{item_name} 上架数量调整: 点击 {self.clicks} 次, 读取 {self.reads} 次")
+        metrics.incr("sell.slider_adjustments")
+        metrics.incr("sell.slider_clicks", self.clicks)
+        metrics.incr("sell.slider_reads", self.reads)
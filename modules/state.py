@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from enum import Enum, auto
 
 
@@ -9,3 +10,74 @@ class GameState(Enum):
     RECONNECT = auto()  # 重启后（重连入局）
     LOBBY_GO = auto()  # 大厅界面（出发）
     GLITCH = auto()  # 故障界面（方案）
+
+
+@dataclass(frozen=True)
+class StateSpec:
+    """状态图中的一个节点。"""
+
+    templates: tuple[str, ...]  # 识别该状态的模板，任一命中即可
+    successors: tuple[GameState, ...]  # 处理完该状态后可能出现的下一状态
+    timeout: float  # 离开该状态后，超过此时长仍无法识别任何状态则触发恢复
+    description: str = ""
+
+
+# 状态优先级即字典顺序：完整检测时按此顺序逐个匹配
+STATE_GRAPH: dict[GameState, StateSpec] = {
+    GameState.RECONNECT: StateSpec(
+        templates=("重连入局",),
+        successors=(GameState.LOBBY,),
+        timeout=100.0,
+        description="重连提示",
+    ),
+    GameState.MAP_SELECT: StateSpec(
+        templates=("战略板",),
+        successors=(GameState.PREPARE,),
+        timeout=100.0,
+        description="选图界面",
+    ),
+    GameState.PREPARE: StateSpec(
+        templates=("装备配置",),
+        successors=(GameState.LOBBY_GO, GameState.GLITCH),
+        timeout=100.0,
+        description="配装界面",
+    ),
+    GameState.GLITCH: StateSpec(
+        templates=("推荐配装",),
+        successors=(GameState.LOBBY,),
+        timeout=100.0,
+        description="准备界面",
+    ),
+    GameState.LOBBY: StateSpec(
+        templates=("行前备战",),
+        successors=(GameState.MAP_SELECT, GameState.LOBBY),
+        timeout=100.0,
+        description="大厅",
+    ),
+    GameState.LOBBY_GO: StateSpec(
+        templates=("出发",),
+        successors=(GameState.RECONNECT,),
+        timeout=100.0,
+        description="出发界面",
+    ),
+}
+
+# 任何状态之后都可能被打断进入的状态，总是最先检测
+INTERRUPT_STATES: tuple[GameState, ...] = (GameState.RECONNECT,)
+
+UNKNOWN_TIMEOUT = 100.0
+
+
+def detection_stages(previous: GameState) -> list[list[GameState]]:
+    """
+    返回分批检测的状态：先检测打断状态与 previous 的预期后继，未命中再检测其余状态。
+    每批内部保持 STATE_GRAPH 的固定优先级，同一帧命中多个状态时取优先级最高者。
+    """
+    if previous not in STATE_GRAPH:
+        return [list(STATE_GRAPH)]
+
+    expected = set(INTERRUPT_STATES) | set(STATE_GRAPH[previous].successors)
+    return [
+        [state for state in STATE_GRAPH if state in expected],
+        [state for state in STATE_GRAPH if state not in expected],
+    ]
@@ -0,0 +1,180 @@
+from dataclasses import dataclass
+from typing import NamedTuple, Optional, Protocol
+
+from utils import config
+from utils.logger import logger
+from utils.metrics import metrics
+from utils.price_history import price_history
+
+PROBE_QUANTITY = 31
+BULK_QUANTITY = 200
+WAIT = -1  # 留在详情页盯价，价格回落到目标价格后再决定
+
+
+class Fill(NamedTuple):
+    """一次购买的结果"""
+
+    unit_price: float  # 成交单价，购买失败为 0
+    displayed_price: int  # 购买前详情页显示的价格
+    reconciled: bool  # unit_price 是否经过余额校准（否则为按显示价格的预测值）
+
+
+@dataclass
+class PurchaseContext:
+    item_name: str
+    target_price: int
+    displayed_price: int  # 当前详情页显示的价格，读不到为 0
+    remaining: int  # 距离目标数量还差多少
+
+
+class PurchaseStrategy(Protocol):
+    """购买策略：在物品详情页内逐次决定购买数量"""
+
+    name: str
+
+    def reset(self, item_name: str) -> None:
+        """每次进入详情页时调用"""
+
+    def next_quantity(self, ctx: PurchaseContext) -> int:
+        """返回本次购买数量（31 或 200），返回 WAIT 表示盯价等待，返回 0 表示离开详情页"""
+
+    def watch_price(self, ctx: PurchaseContext) -> int:
+        """返回 WAIT 时，显示价格回落到多少再继续"""
+
+    def observe(self, quantity: int, fill: Fill) -> None:
+        """记录本次购买结果"""
+
+
+class ProbeThenBulkStrategy:
+    """
+    先买 31 个探测单价，不高于目标价格则连续买 200 个，直到单价超过目标价格
+
+    历史批量成交数据足够时，用 显示价格 × 历史滑点 预测批量单价，不高于目标价格则跳过探测。
+    """
+
+    name = "probe_bulk"
+
+    def __init__(self):
+        self._target_price = 0
+        self._phase = "probe"
+        self._slippage: Optional[float] = None
+
+    def reset(self, item_name: str) -> None:
+        self._phase = "probe"
+        self._slippage = price_history.slippage(
+            item_name, window=config.PRICE_HISTORY_WINDOW
+        )
+
+    def next_quantity(self, ctx: PurchaseContext) -> int:
+        self._target_price = ctx.target_price
+        if self._phase == "probe":
+            if self._slippage is not None and ctx.displayed_price:
+                predicted = ctx.displayed_price * self._slippage
+                if predicted <= ctx.target_price:
+                    # 历史数据足以判断，省去 31 个的探测购买
+                    logger.info(f"按历史滑点预测批量单价 {predicted:.0f}，跳过探测")
+                    metrics.incr("market.probe_skipped")
+                    self._phase = "bulk"
+                    return BULK_QUANTITY
+            return PROBE_QUANTITY
+        if self._phase == "bulk":
+            return BULK_QUANTITY
+        return 0
+
+    def watch_price(self, ctx: PurchaseContext) -> int:
+        return ctx.target_price
+
+    def observe(self, quantity: int, fill: Fill) -> None:
+        ok = 0 < fill.unit_price <= self._target_price
+        if quantity == PROBE_QUANTITY:
+            if not ok:
+                logger.info(
+                    f"探测价格 {fill.unit_price} 高于目标价格 {self._target_price}，继续探测"
+                )
+            self._phase = "bulk" if ok else "done"
+        elif not ok:
+            logger.info("价格上涨，跳回探测模式")
+            self._phase = "done"
+
+
+class AdaptiveStrategy:
+    """
+    按价格流与历史成交数据决定购买数量
+
+    显示价格是最低挂单价，成交单价不会低于它：显示价格不高于目标价格时直接买 200 个，不花一次小额购买去探测，
+    高于目标价格时留在详情页盯价。校准后的批量成交单价超过目标价格说明低价挂单不够厚，
+    之后改为等显示价格回落到 目标价格 / 滑点 以下再买，直到再次在目标价格以内成交；
+    滑点取历史批量成交的中位数，并随本次校准后的批量成交更新。只有剩余数量不足 200 个时才买 31 个。
+
+    与 probe_bulk 相比不会为超过目标价格的挂单付钱，平均单价更低、每个物品所需的购买与余额读取更少，
+    代价是价格高于目标时只等待不购买，每分钟买到的数量更少。
+    """
+
+    name = "adaptive"
+
+    def __init__(self):
+        self._slippage: Optional[float] = None
+        self._target_price = 0
+        self._cautious = False  # 上次校准后的批量成交单价超过目标价格
+        self._failures = 0
+
+    def reset(self, item_name: str) -> None:
+        self._slippage = price_history.slippage(
+            item_name, window=config.PRICE_HISTORY_WINDOW
+        )
+        self._cautious = False
+        self._failures = 0
+
+    def _bulk_trigger(self, target_price: int) -> int:
+        """显示价格不高于该值时买 200 个"""
+        if not self._cautious:
+            return target_price
+        # 没有滑点数据时按显示价格判断，由余额校准得到实际滑点
+        slippage = self._slippage or 1.0
+        return int(target_price / (slippage * (1 + config.STRATEGY_BULK_MARGIN)))
+
+    def next_quantity(self, ctx: PurchaseContext) -> int:
+        self._target_price = ctx.target_price
+        if self._failures >= 2:
+            return 0
+        if ctx.remaining < BULK_QUANTITY:
+            return PROBE_QUANTITY
+
+        displayed = ctx.displayed_price
+        if displayed and displayed <= self._bulk_trigger(ctx.target_price):
+            return BULK_QUANTITY
+        if displayed:
+            logger.info(
+                f"显示价格 {displayed} 高于触发价格 {self._bulk_trigger(ctx.target_price)}，盯价等待"
+            )
+        return WAIT
+
+    def watch_price(self, ctx: PurchaseContext) -> int:
+        return self._bulk_trigger(ctx.target_price)
+
+    def observe(self, quantity: int, fill: Fill) -> None:
+        if fill.unit_price == 0:
+            self._failures += 1
+            return
+        self._failures = 0
+        if quantity == BULK_QUANTITY and fill.reconciled and fill.displayed_price:
+            self._cautious = fill.unit_price > self._target_price
+            ratio = fill.unit_price / fill.displayed_price
+            # 本次观测到的滑点比历史更可信，向其靠拢
+            self._slippage = (
+                ratio if self._slippage is None else (self._slippage + ratio) / 2
+            )
+
+
+STRATEGIES = {
+    ProbeThenBulkStrategy.name: ProbeThenBulkStrategy,
+    AdaptiveStrategy.name: AdaptiveStrategy,
+}
+
+
+def create_strategy(name: Optional[str] = None) -> PurchaseStrategy:
+    """按名称创建购买策略，默认取 config.PURCHASE_STRATEGY"""
+    name = name or config.PURCHASE_STRATEGY
+    if name not in STRATEGIES:
+        raise ValueError(f"未知的购买策略: {name}")
+    return STRATEGIES[name]()
@@ -0,0 +1,102 @@
+from collections import deque
+from typing import Callable, Optional
+
+import cv2
+import numpy as np
+
+from core.agent import Agent
+from utils import config
+from utils.logger import logger
+from utils.metrics import metrics
+
+
+class PriceTicker:
+    """
+    详情页价格行情
+
+    在物品详情页上逐帧读取 price ROI，输出带时间戳的价格流。
+    ROI 像素与上一次 OCR 时相比几乎不变时直接复用上次结果，只有价格区域真正变化才做 OCR。
+    """
+
+    def __init__(self, operator: Agent, roi: Optional[list[int]] = None):
+        self.operator = operator
+        self.roi = roi or config.per_price_roi
+        self.history: deque[tuple[float, int]] = deque(maxlen=config.TICKER_HISTORY)
+        self._last_crop: Optional[np.ndarray] = None
+        self._last_price = 0
+
+    def reset(self) -> None:
+        """离开详情页时调用，避免把上一个页面的价格带到下一次"""
+        self._last_crop = None
+        self._last_price = 0
+
+    def read(self, frame: Optional[np.ndarray] = None) -> int:
+        """读取当前帧的价格，读不到返回 0"""
+        if frame is None:
+            frame = self.operator.get_frame()
+            if frame is None:
+                return 0
+
+        x1, y1, x2, y2 = self.roi
+        crop = frame[y1:y2, x1:x2]
+        last = self._last_crop
+        if (
+            last is not None
+            and last.shape == crop.shape
+            and cv2.norm(crop, last, cv2.NORM_L1) / crop.size
+            <= config.TICKER_CHANGE_THRESHOLD
+        ):
+            metrics.incr("ticker.unchanged")
+            return self._last_price
+
+        metrics.incr("ticker.ocr")
+        clean_res = self.operator.read_text("price", frame=frame)
+        price = int(clean_res) if clean_res else 0
+        # 只缓存读成功的结果，读失败的帧下次仍会重新 OCR
+        self._last_crop = crop.copy() if price else None
+        self._last_price = price
+        return price
+
+    def watch(
+        self,
+        threshold: int,
+        timeout: float,
+        on_tick: Optional[Callable[[float, int], None]] = None,
+    ) -> Optional[int]:
+        """
+        逐帧读取价格，直到价格不高于 threshold
+
+        Args:
+            threshold: 触发价格
+            timeout: 最长观察时间（秒）
+            on_tick: 每次读到价格时回调 (时间戳, 价格)
+
+        Returns:
+            触发时的价格，超时返回 None
+        """
+        clock = self.operator.clock
+        deadline = clock.time() + timeout
+        frame = self.operator.get_frame()
+        frame_index = self.operator.get_frame_index()
+        last_price = 0
+
+        while True:
+            if frame is not None:
+                price = self.read(frame)
+                if price:
+                    now = clock.time()
+                    self.history.append((now, price))
+                    if on_tick is not None:
+                        on_tick(now, price)
+                    if price != last_price:
+                        logger.debug(f"价格: {price}")
+                        last_price = price
+                    if price <= threshold:
+                        return price
+
+            remaining = deadline - clock.time()
+            if remaining <= 0:
+                return None
+            frame, frame_index = self.operator.wait_new_frame(
+                frame_index, timeout=min(remaining, 1.0)
+            )
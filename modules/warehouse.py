@@ -0,0 +1,134 @@
+from typing import NamedTuple, Optional, Tuple
+
+import cv2
+
+from core.agent import Agent
+from utils.logger import logger
+from utils.metrics import metrics
+from vision.ocr import TextBox, match_text
+
+CATEGORY_COUNT = 4
+PAGE_COUNT = 2  # 每个分类翻页一次即可看到全部物品
+SETTLE_TIMEOUT = 1.5  # 切换分类或翻页后等待列表停止滚动的最长时间
+STILL_THRESHOLD = 1.0  # 相邻两帧列表区域平均像素差不超过该值时视为已停止滚动
+
+
+class WarehouseLocation(NamedTuple):
+    category: int  # 分类标签序号
+    page: int  # 进入分类后向下翻页的次数
+
+
+class WarehouseIndex:
+    """
+    仓库物品位置索引
+
+    记录每个物品最近一次出现在哪个分类、翻了几页，查找时直接跳到该位置验证；
+    位置失效或从未见过时逐页扫描，每页只做一次整帧 OCR，并把页面上识别到的所有物品名都记入索引，
+    之后查找其他物品也能直接跳转。
+    """
+
+    def __init__(self, operator: Agent):
+        self.operator = operator
+        self.locations: dict[str, WarehouseLocation] = {}
+        self._pages: dict[WarehouseLocation, list[TextBox]] = {}
+        self._current: Optional[WarehouseLocation] = None
+
+    def reset_view(self) -> None:
+        """整理仓库或离开仓库页面后调用，当前所在分类与翻页位置不再可信"""
+        self._current = None
+
+    def _goto(self, location: WarehouseLocation) -> None:
+        if self._current == location:
+            return
+
+        frame_index = self.operator.get_frame_index()
+        current = self._current
+        if (
+            current is None
+            or current.category != location.category
+            or current.page > location.page
+        ):
+            y = 1070 - 130 * location.category
+            self.operator.click((2460, y))
+            self.operator.clock.sleep(0.5)
+            page = 0
+        else:
+            page = current.page
+
+        for _ in range(location.page - page):
+            self.operator.swipe((1900, 800), (1900, 600))
+        self._current = location
+        self._wait_settled(frame_index)
+
+    def _wait_settled(self, frame_index: int) -> None:
+        """
+        等待切换分类或翻页后的新画面，并等到相邻两帧的列表区域不再变化
+
+        页面 OCR 按帧序号缓存，不等新帧就会把上一页的识别结果记到新位置下。
+        """
+        clock = self.operator.clock
+        deadline = clock.time() + SETTLE_TIMEOUT
+        frame, frame_index = self.operator.wait_new_frame(frame_index, timeout=SETTLE_TIMEOUT)
+        region = self.operator.get_region("warehouse")
+        while frame is not None:
+            remaining = deadline - clock.time()
+            if remaining <= 0:
+                logger.debug("仓库列表在等待时间内未静止")
+                return
+            next_frame, next_index = self.operator.wait_new_frame(
+                frame_index, timeout=min(remaining, 0.2)
+            )
+            if next_frame is None or next_index == frame_index:
+                # 没有新帧说明画面已不再变化
+                return
+            if region:
+                x1, y1, x2, y2 = region
+                previous, current = frame[y1:y2, x1:x2], next_frame[y1:y2, x1:x2]
+            else:
+                previous, current = frame, next_frame
+            if cv2.norm(previous, current, cv2.NORM_L1) / current.size <= STILL_THRESHOLD:
+                return
+            frame, frame_index = next_frame, next_index
+
+    def _index_page(self, location: WarehouseLocation) -> list[TextBox]:
+        boxes = self.operator.read_page(roi=self.operator.get_region("warehouse"))
+        self._pages[location] = boxes
+        metrics.incr("warehouse.pages_indexed")
+        return boxes
+
+    def _lookup(self, item_name: str) -> Optional[WarehouseLocation]:
+        if location := self.locations.get(item_name):
+            return location
+        for location, boxes in self._pages.items():
+            if match_text(boxes, item_name):
+                return location
+        return None
+
+    def _forget(self, item_name: str, location: WarehouseLocation) -> None:
+        self.locations.pop(item_name, None)
+        self._pages.pop(location, None)
+
+    def find(self, item_name: str) -> Optional[Tuple[int, int]]:
+        """查找物品在当前画面上的坐标，找不到返回 None"""
+        if location := self._lookup(item_name):
+            self._goto(location)
+            if coord := self.operator.locate(
+                item_name, ocr=True, template_type="warehouse"
+            ):
+                metrics.incr("warehouse.index_hits")
+                self.locations[item_name] = location
+                return coord
+            logger.debug(f"仓库索引位置已失效: {item_name} -> {location}")
+            metrics.incr("warehouse.index_misses")
+            self._forget(item_name, location)
+
+        for category in range(CATEGORY_COUNT):
+            for page in range(PAGE_COUNT):
+                location = WarehouseLocation(category, page)
+                self._goto(location)
+                if match := match_text(self._index_page(location), item_name):
+                    self.locations[item_name] = location
+                    return match.center
+
+        logger.warning(f"在仓库中未找到物品: {item_name}")
+        return None
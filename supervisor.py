@@ -0,0 +1,210 @@
+"""
+多设备调度器
+为每台已连接的设备启动独立的机器人进程，汇报各设备吞吐量并自动重启崩溃的进程
+"""
+
+import multiprocessing as mp
+import subprocess
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from adbutils import adb
+
+from utils import config
+from utils.logger import logger
+from vision.service import VisionClient, serve
+
+
+def discover_devices() -> list[str]:
+    """返回所有处于 device 状态的设备序列号。"""
+    return [d.serial for d in adb.device_list() if d.serial]
+
+
+def _worker(
+    serial: str, action: str, events: mp.Queue, vision_address: Optional[str]
+) -> None:
+    """子进程入口：在指定设备上运行机器人。"""
+    from bot import Bot, run_buy_rounds
+    from utils.metrics import MetricsReporter, metrics
+
+    vision = VisionClient(vision_address) if vision_address else None
+    bot = Bot(serial, vision)
+    bot.operator.start()
+    reporter = MetricsReporter(metrics, name=f"autodelta-{serial}")
+    reporter.start()
+    try:
+        if action == "buy":
+            run_buy_rounds(
+                bot,
+                on_round_finished=lambda round_num: events.put(
+                    (serial, "round", round_num, time.time())
+                ),
+            )
+        elif action == "sell":
+            bot.sell()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reporter.stop()
+        bot.operator.stop()
+
+
+@dataclass
+class _WorkerState:
+    serial: str
+    process: Optional[mp.Process] = None
+    started_at: float = 0.0
+    restarts: int = 0
+    rounds: int = 0
+    round_times: list[float] = field(default_factory=list)
+    finished: bool = False
+
+
+class Supervisor:
+    """多设备调度器：每台设备一个进程，互不影响。
+
+    shared_vision=True 时额外启动一个视觉服务进程，各设备进程共享模板与 OCR 模型。
+    """
+
+    def __init__(
+        self,
+        action: str = "buy",
+        serials: Optional[list[str]] = None,
+        report_interval: float = 60.0,
+        restart_delay: float = 5.0,
+        max_restarts: int = 20,
+        shared_vision: bool = True,
+    ):
+        self.action = action
+        self.vision_address = config.VISION_SERVICE_ADDRESS if shared_vision else None
+        self._vision_process: Optional[mp.Process] = None
+        self.serials = serials if serials is not None else discover_devices()
+        self.report_interval = report_interval
+        self.restart_delay = restart_delay
+        self.max_restarts = max_restarts
+        self._ctx = mp.get_context("spawn")
+        self._events = self._ctx.Queue()
+        self._workers = {serial: _WorkerState(serial) for serial in self.serials}
+
+    def _spawn(self, state: _WorkerState) -> None:
+        process = self._ctx.Process(
+            target=_worker,
+            args=(state.serial, self.action, self._events, self.vision_address),
+            name=f"bot-{state.serial}",
+            daemon=True,
+        )
+        process.start()
+        state.process = process
+        state.started_at = time.time()
+        logger.info(f"[{state.serial}] 机器人进程已启动 pid={process.pid}")
+
+    def _ensure_vision_service(self) -> None:
+        """启动视觉服务进程，崩溃后重新拉起。"""
+        if self.vision_address is None:
+            return
+        if self._vision_process is not None and self._vision_process.is_alive():
+            return
+        if self._vision_process is not None:
+            logger.warning("视觉服务进程异常退出，正在重启")
+
+        self._vision_process = self._ctx.Process(
+            target=serve, args=(self.vision_address,), name="vision", daemon=True
+        )
+        self._vision_process.start()
+
+    def _drain_events(self) -> None:
+        while not self._events.empty():
+            serial, kind, _, timestamp = self._events.get_nowait()
+            state = self._workers.get(serial)
+            if state is not None and kind == "round":
+                state.rounds += 1
+                state.round_times.append(timestamp)
+
+    def _check_workers(self) -> None:
+        for state in self._workers.values():
+            process = state.process
+            if process is None or process.is_alive() or state.finished:
+                continue
+
+            if process.exitcode == 0:
+                logger.info(f"[{state.serial}] 机器人进程正常结束")
+                state.finished = True
+                continue
+
+            if state.restarts >= self.max_restarts:
+                logger.error(
+                    f"[{state.serial}] 重启次数已达上限 {self.max_restarts}，不再重启"
+                )
+                state.finished = True
+                continue
+
+            if time.time() - state.started_at < self.restart_delay:
+                continue
+
+            state.restarts += 1
+            logger.warning(
+                f"[{state.serial}] 机器人进程异常退出 (exitcode={process.exitcode})，"
+                f"第 {state.restarts} 次重启"
+            )
+            self._spawn(state)
+
+    def report(self) -> None:
+        """输出各设备吞吐量。"""
+        now = time.time()
+        for state in self._workers.values():
+            recent = [t for t in state.round_times if now - t <= 3600]
+            alive = state.process is not None and state.process.is_alive()
+            logger.info(
+                f"[{state.serial}] 运行中={alive} 总轮数={state.rounds} "
+                f"近一小时轮数={len(recent)} 重启次数={state.restarts}"
+            )
+
+    def run(self) -> None:
+        if not self.serials:
+            logger.error("未发现任何已连接设备")
+            return
+
+        logger.info(f"发现 {len(self.serials)} 台设备: {', '.join(self.serials)}")
+        self._ensure_vision_service()
+        for state in self._workers.values():
+            self._spawn(state)
+
+        last_report = time.time()
+        try:
+            while not all(state.finished for state in self._workers.values()):
+                self._drain_events()
+                self._ensure_vision_service()
+                self._check_workers()
+                if time.time() - last_report >= self.report_interval:
+                    self.report()
+                    last_report = time.time()
+                time.sleep(1)
+        finally:
+            self._drain_events()
+            self.report()
+            for state in self._workers.values():
+                if state.process is not None and state.process.is_alive():
+                    state.process.terminate()
+                    state.process.join(timeout=5)
+            if self._vision_process is not None and self._vision_process.is_alive():
+                self._vision_process.terminate()
+                self._vision_process.join(timeout=5)
+
+
+def main(action: str = "buy"):
+    """主函数"""
+    logger.info("AutoDelta 多设备调度启动中...")
+
+    caffeinate_process = subprocess.Popen(["caffeinate", "-i"])
+    try:
+        Supervisor(action).run()
+    except KeyboardInterrupt:
+        logger.info("用户手动停止")
+    finally:
+        caffeinate_process.terminate()
+        caffeinate_process.wait()
+
+
+if __name__ == "__main__":
+    main("buy")
@@ -0,0 +1,40 @@
+import logging
+
+import pytest
+
+from benchmarks.market_sim import simulate
+from utils.logger import logger
+from utils.price_history import price_history
+
+
+@pytest.fixture(autouse=True)
+def isolated_history(tmp_path):
+    """模拟数据写入临时价格历史，不影响真实数据库"""
+    path, clock, level = price_history.path, price_history.clock, logger.level
+    price_history.path = tmp_path / "prices.sqlite3"
+    logger.setLevel(logging.WARNING)
+    yield
+    price_history.close()
+    price_history.path, price_history.clock = path, clock
+    logger.setLevel(level)
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_adaptive_trades_throughput_for_price(seed):
+    probe_bulk = simulate("probe_bulk", 10, 400, 480, seed)
+    adaptive = simulate("adaptive", 10, 400, 480, seed)
+
+    assert probe_bulk["bought"] > 0 and adaptive["bought"] > 0
+    assert (
+        adaptive["purchases"] / adaptive["bought"]
+        < probe_bulk["purchases"] / probe_bulk["bought"]
+    )
+    assert (
+        adaptive["coin_reads"] / adaptive["bought"]
+        < probe_bulk["coin_reads"] / probe_bulk["bought"]
+    )
+    # 不为超过目标价格的挂单付钱，平均单价低于 probe_bulk
+    assert adaptive["avg_unit_price"] < probe_bulk["avg_unit_price"]
+    # 代价是价格高于目标时只等待：每分钟数量低于 probe_bulk，但不应低于其 3/4
+    assert adaptive["items_per_minute"] < probe_bulk["items_per_minute"]
+    assert adaptive["items_per_minute"] >= 0.75 * probe_bulk["items_per_minute"]
@@ -0,0 +1,63 @@
+import pytest
+
+from modules.slider import NUDGE_OFFSET, SliderController
+from utils import config
+from utils.clock import SimClock
+
+X1, X2, Y = config.slider_end
+
+
+class FakeSlider:
+    """滑条两端各留 5 像素死区的模拟出售页，-/+ 按钮每次改变 1 个"""
+
+    def __init__(self, total: int):
+        self.clock = SimClock()
+        self.total = total
+        self.quantity = 1
+        self.clicks = 0
+
+    def click(self, coord):
+        self.clicks += 1
+        x = coord[0]
+        if x == X2 + NUDGE_OFFSET:
+            self.quantity = min(self.quantity + 1, self.total)
+        elif x == X1 - NUDGE_OFFSET:
+            self.quantity = max(self.quantity - 1, 1)
+        else:
+            fraction = (x - X1 - 5) / (X2 - X1 - 10)
+            self.quantity = max(1, min(self.total, round(fraction * self.total)))
+
+    def read(self):
+        return self.quantity, self.total
+
+
+@pytest.mark.parametrize("total", [3500, 6000, 12000, 45000, 200000])
+def test_set_quantity_reaches_target(total):
+    device = FakeSlider(total)
+    slider = SliderController(device, device.read)
+
+    assert slider.set_quantity("T46M", 3000, total) == 3000
+    assert device.quantity == 3000
+    # 移动滑条 + 回到最佳位置 + 至多半个像素对应数量的微调（两轮）
+    pixel = total / (X2 - X1 - 10)
+    budget = config.SLIDER_MAX_MOVES + 1 + 2 * max(config.SLIDER_MAX_NUDGES, int(pixel / 2) + 1)
+    assert device.clicks == slider.clicks <= budget
+
+
+def test_set_quantity_fills_when_total_is_short():
+    device = FakeSlider(2000)
+    slider = SliderController(device, device.read)
+
+    assert slider.set_quantity("T46M", 3000, 2000) == 2000
+    assert device.clicks == 1
+
+
+def test_set_quantity_refuses_unreachable_target():
+    device = FakeSlider(200000)
+    # -/+ 按钮失效时只能停在滑条像素对应的数量上
+    device.click = lambda coord, click=device.click: None if coord[0] in (
+        X1 - NUDGE_OFFSET, X2 + NUDGE_OFFSET
+    ) else click(coord)
+    slider = SliderController(device, device.read)
+
+    assert slider.set_quantity("T46M", 3000, 200000) is None
@@ -0,0 +1,51 @@
+"""
+时钟模块
+所有等待与超时通过 Agent.clock 进行，模拟运行时可替换为瞬间推进的 SimClock
+"""
+
+import threading
+import time
+
+
+class RealClock:
+    """真实时钟，基于单调时钟。"""
+
+    simulated = False
+
+    def time(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+
+class WallClock:
+    """墙上时钟（Unix 时间戳），用于需要跨进程、跨运行持久化的时间。"""
+
+    simulated = False
+
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+
+class SimClock:
+    """模拟时钟：sleep 不阻塞，只推进虚拟时间。"""
+
+    simulated = True
+
+    def __init__(self, start: float = 0.0):
+        self._now = start
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        return self._now
+
+    def sleep(self, seconds: float) -> None:
+        self.advance(seconds)
+
+    def advance(self, seconds: float) -> None:
+        with self._lock:
+            self._now += max(float(seconds), 0.0)
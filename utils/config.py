@@ -1,5 +1,28 @@
 LOOP_INTERVAL = 0.1
 STEP_INTERVAL = 0.2
+VISION_SERVICE_ADDRESS = "/tmp/autodelta-vision.sock"
+NETWORK_CHECK_HOST = "223.5.5.5"  # 开启 WiFi 后等待网络连通时 ping 的地址
+MATCH_SEARCH_MARGIN = 0  # 固定坐标模板匹配时向四周额外搜索的像素，用于容忍界面轻微偏移
+MATCH_PREFILTER = True  # 模板匹配前用窗口均值下界排除明显不匹配的位置
+OCR_DET_SCALE = 1.0  # 按文字定位物品时，文字检测前的缩放比例（<1 时在缩小图上检测、原图上识别）
+BALANCE_RECONCILE_INTERVAL = 5  # 连续预测多少次购买后读取一次实际余额
+BALANCE_TOLERANCE = 0.01  # 预测与实际花费的相对偏差超过该值时，下次购买立即校准
+TICKER_WATCH_TIMEOUT = 5.0  # 详情页价格高于可接受价格时，留在页面盯价的最长时间
+TICKER_CHANGE_THRESHOLD = 2.0  # 价格 ROI 平均像素差不超过该值时视为未变化，复用上次 OCR 结果
+TICKER_HISTORY = 1000  # 保留的价格流条数
+PRICE_HISTORY_DB = "data/prices.sqlite3"  # 价格历史数据库
+PRICE_HISTORY_WINDOW = 6 * 3600.0  # 用历史数据做购买决策时参考最近多少秒
+PRICE_HISTORY_MIN_SAMPLES = 5  # 少于该样本数时不依据历史数据决策
+PURCHASE_STRATEGY = "probe_bulk"  # 购买策略: probe_bulk（先探测再批量）/ adaptive（按价格流与历史决定，单价更低但每分钟数量更少）
+STRATEGY_BULK_MARGIN = 0.0  # adaptive 策略中预测批量单价至少低于目标价格该比例时才买 200 个，否则盯价等待
+SELL_QUANTITY = 3000  # 每次上架的数量
+SELL_SLOT_TIMEOUT = 600.0  # 货架已满时留在出售页等待空位的最长时间
+SLIDER_MAX_MOVES = 4  # 调整上架数量时最多拖动滑条几次
+SLIDER_MAX_NUDGES = 20  # 滑条移动后用 -/+ 按钮补齐差值的最少允许点击次数，数量多时放宽到半个像素对应的数量
+PURCHASE_ORDERS = [("箭", 400, 480, 2000)]  # 每轮购买的物品: (名称, 目标价格, 最大可接受价格, 目标数量)
+GLITCH_WIFI_DELAY = 10.0  # 卡点后恢复网络前的游戏侧等待，设备状态无法观测
+MATCH_COMMIT_DELAY = 6.0  # 点击出发后等待对局分配的游戏侧时间，之后再重启应用
+TRACE_OUTPUT = ""  # 非空时启用 tracing，退出时导出 Chrome trace JSON 到该路径
 
 # ----------------------------------------------------#
 
@@ -0,0 +1,196 @@
+"""
+指标模块
+记录各阶段耗时与计数，定期输出 JSON / Prometheus textfile 汇总
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from utils.clock import RealClock, SimClock
+from utils.logger import logger
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class Metrics:
+    """
+    线程安全的耗时与计数记录器，耗时只保留最近 max_samples 个样本用于分位数。
+
+    耗时与运行时长按 clock 计量，模拟运行时换成 SimClock 即按虚拟时间统计。
+    """
+
+    def __init__(
+        self, max_samples: int = 2048, clock: Optional[RealClock | SimClock] = None
+    ):
+        self.max_samples = max_samples
+        self.clock = clock if clock is not None else RealClock()
+        self._lock = threading.Lock()
+        self._samples: dict[str, deque[float]] = {}
+        self._timing_counts: dict[str, int] = {}
+        self._timing_totals: dict[str, float] = {}
+        self._counters: dict[str, float] = {}
+        self._started_at = self.clock.time()
+
+    def use_clock(self, clock: RealClock | SimClock) -> None:
+        """切换计时用的时钟（如模拟运行的 SimClock），运行时长从此刻重新计算"""
+        with self._lock:
+            self.clock = clock
+            self._started_at = clock.time()
+
+    def observe(self, name: str, seconds: float) -> None:
+        """记录一次耗时（秒）。"""
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.max_samples)
+            samples.append(seconds)
+            self._timing_counts[name] = self._timing_counts.get(name, 0) + 1
+            self._timing_totals[name] = self._timing_totals.get(name, 0.0) + seconds
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """计数器累加。"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """计时上下文，异常退出时同样记录。"""
+        clock = self.clock
+        start = clock.time()
+        try:
+            yield
+        finally:
+            self.observe(name, clock.time() - start)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+            self._timing_counts.clear()
+            self._timing_totals.clear()
+            self._counters.clear()
+            self._started_at = self.clock.time()
+
+    def summary(self) -> dict[str, Any]:
+        """返回当前汇总：计数与每小时速率，耗时的 p50/p95/max/mean。"""
+        with self._lock:
+            uptime = max(self.clock.time() - self._started_at, 1e-9)
+            counters = {
+                name: {"count": value, "per_hour": value * 3600 / uptime}
+                for name, value in self._counters.items()
+            }
+            timings = {}
+            for name, samples in self._samples.items():
+                values = sorted(samples)
+                count = self._timing_counts[name]
+                timings[name] = {
+                    "count": count,
+                    "per_hour": count * 3600 / uptime,
+                    "mean": self._timing_totals[name] / count,
+                    "p50": _percentile(values, 0.5),
+                    "p95": _percentile(values, 0.95),
+                    "max": values[-1],
+                }
+        return {
+            "timestamp": time.time(),  # 汇总写出的墙上时间，供外部监控使用
+            "uptime": uptime,
+            "counters": counters,
+            "timings": timings,
+        }
+
+    @staticmethod
+    def _write_atomic(path: Path, content: str) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(content, encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def write_json(self, path: str | Path) -> None:
+        self._write_atomic(
+            Path(path), json.dumps(self.summary(), ensure_ascii=False, indent=2)
+        )
+
+    def write_prometheus(self, path: str | Path) -> None:
+        """以 node_exporter textfile 格式输出。"""
+        summary = self.summary()
+        lines = [
+            "# TYPE autodelta_uptime_seconds gauge",
+            f"autodelta_uptime_seconds {summary['uptime']:.3f}",
+            "# TYPE autodelta_events_total counter",
+        ]
+        for name, item in summary["counters"].items():
+            lines.append(f'autodelta_events_total{{name="{name}"}} {item["count"]}')
+
+        lines.append("# TYPE autodelta_duration_seconds summary")
+        for name, item in summary["timings"].items():
+            for quantile in ("p50", "p95"):
+                q = "0.5" if quantile == "p50" else "0.95"
+                lines.append(
+                    f'autodelta_duration_seconds{{name="{name}",quantile="{q}"}} '
+                    f"{item[quantile]:.6f}"
+                )
+            lines.append(
+                f'autodelta_duration_seconds_count{{name="{name}"}} {item["count"]}'
+            )
+            lines.append(
+                f'autodelta_duration_seconds_sum{{name="{name}"}} '
+                f'{item["mean"] * item["count"]:.6f}'
+            )
+        self._write_atomic(Path(path), "\n".join(lines) + "\n")
+
+
+class MetricsReporter:
+    """后台线程，每隔 interval 秒将汇总写入 <directory>/<name>.json 与 .prom。"""
+
+    def __init__(
+        self,
+        registry: Metrics,
+        directory: str | Path = "metrics",
+        name: str = "autodelta",
+        interval: float = 60.0,
+    ):
+        self.registry = registry
+        self.json_path = Path(directory) / f"{name}.json"
+        self.prom_path = Path(directory) / f"{name}.prom"
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def flush(self) -> None:
+        try:
+            self.registry.write_json(self.json_path)
+            self.registry.write_prometheus(self.prom_path)
+        except OSError as e:
+            logger.error(f"写入指标失败: {e}")
+
+    def _loop(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.flush()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.flush()
+
+
+# 全局指标实例
+metrics = Metrics()
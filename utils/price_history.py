@@ -0,0 +1,229 @@
+"""
+价格历史
+将市场上观测到的价格（预检价、探测单价、批量单价、盯价变化）追加写入本地 SQLite，
+写入在后台线程中批量完成，不占用购买流程的时间；提供按物品的滚动统计查询。
+
+用法:
+    python -m utils.price_history 箭 [--window 86400]
+"""
+
+import argparse
+import atexit
+import queue
+import sqlite3
+import statistics
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+from utils import config
+from utils.clock import SimClock, WallClock
+from utils.logger import logger
+from utils.metrics import _percentile, metrics
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (
+    ts REAL NOT NULL,
+    item TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    price REAL NOT NULL,
+    reference REAL
+);
+CREATE INDEX IF NOT EXISTS prices_item_ts ON prices (item, ts);
+"""
+
+
+class PriceHistory:
+    """
+    价格观测记录
+
+    kind: preview 预检价 / tick 盯价变化 / probe 探测成交单价 / bulk 批量成交单价；
+    reference 为成交时详情页显示的价格，用于估计成交价相对显示价的滑点。
+    时间戳与统计窗口按 clock 计算，默认为墙上时钟；模拟运行时换成 SimClock。
+    """
+
+    def __init__(
+        self,
+        path: str | Path = config.PRICE_HISTORY_DB,
+        flush_interval: float = 1.0,
+        batch_size: int = 256,
+        clock: Optional[WallClock | SimClock] = None,
+    ):
+        self.path = Path(path)
+        self.clock = clock if clock is not None else WallClock()
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue: queue.Queue[Optional[tuple]] = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        # 多个设备进程共用同一个库
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def _ensure_writer(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._writer_loop, name="price-history", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _writer_loop(self) -> None:
+        conn = self._connect()
+        stopping = False
+        while not stopping:
+            try:
+                rows = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(rows) < self.batch_size:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stopping = None in rows
+            batch = [row for row in rows if row is not None]
+            try:
+                if batch:
+                    with conn:
+                        conn.executemany(
+                            "INSERT INTO prices (ts, item, kind, price, reference) "
+                            "VALUES (?, ?, ?, ?, ?)",
+                            batch,
+                        )
+                    metrics.incr("price_history.rows", len(batch))
+            except sqlite3.Error as e:
+                logger.error(f"写入价格历史失败: {e}")
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+        conn.close()
+
+    def record(
+        self,
+        item: str,
+        kind: str,
+        price: float,
+        reference: Optional[float] = None,
+        timestamp: Optional[float] = None,
+    ) -> None:
+        """记录一次价格观测（立即返回，由后台线程写入）"""
+        if price <= 0:
+            return
+        self._ensure_writer()
+        self._queue.put(
+            (timestamp or self.clock.time(), item, kind, float(price), reference)
+        )
+
+    def flush(self) -> None:
+        """等待已提交的记录全部写入"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout=5)
+
+    def _query(self, sql: str, params: tuple) -> list[tuple]:
+        if not self.path.exists():
+            return []
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def prices(
+        self, item: str, kinds: tuple[str, ...] = (), window: Optional[float] = None
+    ) -> list[float]:
+        """返回 item 在最近 window 秒内（默认全部）的价格，按时间排序"""
+        sql = "SELECT price FROM prices WHERE item = ?"
+        params: list[Any] = [item]
+        if kinds:
+            sql += f" AND kind IN ({', '.join('?' * len(kinds))})"
+            params.extend(kinds)
+        if window is not None:
+            sql += " AND ts >= ?"
+            params.append(self.clock.time() - window)
+        return [row[0] for row in self._query(sql + " ORDER BY ts", tuple(params))]
+
+    def stats(
+        self, item: str, kinds: tuple[str, ...] = (), window: Optional[float] = None
+    ) -> dict[str, float]:
+        """滚动统计：count/min/max/mean 与 p10/p25/median/p75/p90，无数据返回空字典"""
+        values = sorted(self.prices(item, kinds, window))
+        if not values:
+            return {}
+        return {
+            "count": len(values),
+            "min": values[0],
+            "max": values[-1],
+            "mean": statistics.fmean(values),
+            "p10": _percentile(values, 0.1),
+            "p25": _percentile(values, 0.25),
+            "median": _percentile(values, 0.5),
+            "p75": _percentile(values, 0.75),
+            "p90": _percentile(values, 0.9),
+        }
+
+    def slippage(
+        self, item: str, kind: str = "bulk", window: Optional[float] = None
+    ) -> Optional[float]:
+        """成交单价 / 显示价格 的中位数；样本少于 config.PRICE_HISTORY_MIN_SAMPLES 时返回 None"""
+        sql = "SELECT price / reference FROM prices WHERE item = ? AND kind = ? AND reference > 0"
+        params: list[Any] = [item, kind]
+        if window is not None:
+            sql += " AND ts >= ?"
+            params.append(self.clock.time() - window)
+        ratios = sorted(row[0] for row in self._query(sql, tuple(params)))
+        if len(ratios) < config.PRICE_HISTORY_MIN_SAMPLES:
+            return None
+        return _percentile(ratios, 0.5)
+
+    def suggest(
+        self, item: str, window: Optional[float] = None
+    ) -> Optional[tuple[int, int]]:
+        """根据成交单价给出 (目标价格, 最大可接受价格) 建议：p25 与中位数"""
+        stats = self.stats(item, ("probe", "bulk"), window)
+        if stats.get("count", 0) < config.PRICE_HISTORY_MIN_SAMPLES:
+            return None
+        return int(stats["p25"]), int(stats["median"])
+
+
+price_history = PriceHistory()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查询价格历史")
+    parser.add_argument("item")
+    parser.add_argument("--window", type=float, help="只统计最近多少秒")
+    parser.add_argument("--db", type=Path, default=Path(config.PRICE_HISTORY_DB))
+    args = parser.parse_args()
+
+    history = PriceHistory(args.db)
+    for kind in ("preview", "tick", "probe", "bulk"):
+        stats = history.stats(args.item, (kind,), args.window)
+        if stats:
+            print(
+                f"{kind:<8} n={stats['count']:<6} min={stats['min']:.0f} "
+                f"p25={stats['p25']:.0f} median={stats['median']:.0f} "
+                f"p75={stats['p75']:.0f} max={stats['max']:.0f}"
+            )
+    if suggestion := history.suggest(args.item, args.window):
+        print(f"建议目标价格 {suggestion[0]}, 最大可接受价格 {suggestion[1]}")
+    if (slip := history.slippage(args.item, window=args.window)) is not None:
+        print(f"批量成交滑点 x{slip:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+追踪模块
+轻量级 span 记录，导出 Chrome trace-event JSON（chrome://tracing / Perfetto 可直接打开）
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class _NullSpan:
+    """禁用时返回的空 span，几乎零开销。"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "cat", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, cat: str, args: dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.tracer._record(self.name, self.cat, self.start, end, self.args)
+        return False
+
+
+class Tracer:
+    """span 记录器，默认禁用；最多保留 max_events 个事件。"""
+
+    def __init__(self, max_events: int = 200_000):
+        self.enabled = False
+        self._events: deque[dict[str, Any]] = deque(maxlen=max_events)
+        self._origin = time.perf_counter_ns()
+        self._pid = os.getpid()
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def clear(self) -> None:
+        self._events.clear()
+
+    def span(self, name: str, cat: str = "", **args: Any):
+        """返回 span 上下文；禁用时返回空 span。"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, cat, args)
+
+    def _record(
+        self, name: str, cat: str, start: int, end: int, args: dict[str, Any]
+    ) -> None:
+        # deque.append 本身线程安全
+        self._events.append(
+            {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": (start - self._origin) / 1000,
+                "dur": (end - start) / 1000,
+                "pid": self._pid,
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+        )
+
+    def export_chrome(self, path: str | Path) -> None:
+        """导出 Chrome trace-event JSON。"""
+        thread_names = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": self._pid,
+                "tid": thread.ident,
+                "args": {"name": thread.name},
+            }
+            for thread in threading.enumerate()
+        ]
+        data = {"traceEvents": thread_names + list(self._events)}
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, default=str)
+
+
+# 全局追踪实例
+tracer = Tracer()
+
+
+def traced(name: str, cat: str = "") -> Callable[[F], F]:
+    """方法装饰器：整个调用记为一个 span，位置参数（除 self）记入 args。"""
+
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(name, cat, args=args[1:], **kwargs):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorator
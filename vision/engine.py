@@ -1,6 +1,6 @@
 import numpy as np
 from vision.match import Matcher
-from vision.ocr import Ocr
+from vision.ocr import Ocr, TextBox
 from typing import Literal, Optional, Tuple, TypedDict
 
 
@@ -38,13 +38,20 @@ class VisionEngine:
         target: str,
         ocr: bool,
         template_type: Optional[Literal["warehouse", "marketplace"]] = None,
+        page: Optional[list[TextBox]] = None,
     ) -> Optional[Tuple[int, int]]:
-        """输入 frame + target_name，输出坐标。"""
+        """
+        输入 frame + target_name，输出坐标。
+
+        page 为同一帧已有的 read_page 结果，OCR 定位时复用而不再重新检测。
+        """
         if ocr and template_type is not None:
             target_cache = self._template_cache.setdefault(target, {})
             template = target_cache.get(template_type)
             if template is None:
-                crop = self.ocr.find_text_and_crop(frame, target)
+                crop = self.ocr.find_text_and_crop(
+                    frame, target, page, self.get_region(template_type)
+                )
                 if crop is None:
                     return None
                 target_cache[template_type] = crop
@@ -58,6 +65,23 @@ class VisionEngine:
 
         return None
 
+    def locate_many(
+        self, frame: np.ndarray, targets: list[str]
+    ) -> dict[str, Optional[Tuple[int, int]]]:
+        """一次匹配多个固定坐标模板，返回 {target: 坐标或 None}。"""
+        return self.matcher.find_templates(frame, targets)
+
+    def read_page(
+        self, frame: np.ndarray, roi: Optional[list[int]] = None
+    ) -> list[TextBox]:
+        """OCR 一次（可限定在 roi 内），返回所有识别到的文字。"""
+        return self.ocr.read_page(frame, roi)
+
+    def get_region(self, name: str) -> Optional[list[int]]:
+        """返回 coords.json 中定义的区域（如 warehouse / marketplace 的文字检测范围），未定义返回 None。"""
+        region = self.matcher.coords.get(name)
+        return list(region) if region else None
+
     def get_template_coords(self, target_name: str) -> Tuple[int, int]:
         """返回 coords.json 里的静态中心坐标。"""
         if target_name in self.matcher.coords:
@@ -65,14 +89,26 @@ class VisionEngine:
             return (x1 + x2) // 2, (y1 + y2) // 2
         return (0, 0)
 
-    def read_text(self, frame: np.ndarray, target_name: str, cropped: bool) -> str:
-        """输入 frame + target_name，输出 OCR 文本。"""
+    def _get_ocr_target(self, target_name: str) -> OcrTarget:
         target = self._ocr_targets.get(target_name)
         if target is None:
             raise KeyError(f"未注册 OCR 目标: {target_name}")
+        return target
+
+    def read_text(self, frame: np.ndarray, target_name: str, cropped: bool) -> str:
+        """输入 frame + target_name，输出 OCR 文本。"""
+        target = self._get_ocr_target(target_name)
 
         roi = target["roi"]
         whitelist = target["whitelist"]
         return self.ocr.do_ocr(
             frame=frame, roi=roi, whitelist=whitelist, cropped=cropped
         )
+
+    def read_text_batch(self, requests: list[tuple[np.ndarray, str]]) -> list[str]:
+        """批量读取多个 (frame, target_name) 的文本（仅识别模式）。"""
+        items = []
+        for frame, target_name in requests:
+            target = self._get_ocr_target(target_name)
+            items.append((frame, target["roi"], target["whitelist"]))
+        return self.ocr.do_ocr_batch(items)
@@ -1,62 +1,280 @@
-import time
 import json
+import threading
+import time
 import cv2
 import numpy as np
 from pathlib import Path
-from typing import Optional
+from typing import NamedTuple, Optional
+from utils import config
 from utils.logger import logger
+from utils.metrics import metrics
+from vision.pack import TemplatePack, load_pack
+
+
+class _Templates(NamedTuple):
+    """模板快照：坐标与热更新覆盖项，整体替换以保证原子性。"""
+
+    coords: dict[str, list[int]]
+    overrides: dict[str, Optional[np.ndarray]]  # None 表示模板已被删除
+
+
+class _Signature(NamedTuple):
+    """模板预筛特征：各通道均值与像素平方和。"""
+
+    mean: np.ndarray
+    sqsum: float
 
 
 class Matcher:
     """模板匹配器，用于在屏幕上查找特定图像"""
 
-    def __init__(self):
+    def __init__(self, watch: bool = True, reload_interval: float = 2.0):
         logger.debug("正在初始化模板匹配引擎")
         self.template_dir = Path("templates")
         self.coords_file = self.template_dir / "coords.json"
-        self.coords = {}
-        self.template_cache = {}
-        self._load_coords()
-        self._preload_templates()
+        self.pack: Optional[TemplatePack] = None
+        self._templates = _Templates({}, {})
+        self.coords_version = 0  # coords.json 每次重新加载后加一，供视觉服务客户端判断缓存是否过期
+        self._stack_cache: dict[tuple[int, tuple[str, ...]], tuple] = {}  # 批量匹配用的模板拼接缓存
+        self._signature_cache: dict[str, tuple[np.ndarray, _Signature]] = {}
+        self._load_pack()
 
-    def _preload_templates(self):
-        """预加载所有模板"""
-        if not self.template_dir.exists():
+        self.reload_interval = reload_interval
+        self._source_state = self._scan_sources()
+        self._stop_watch = threading.Event()
+        if watch:
+            threading.Thread(target=self._watch_loop, daemon=True).start()
+
+    @property
+    def coords(self) -> dict[str, list[int]]:
+        return self._templates.coords
+
+    def _load_pack(self):
+        """加载编译好的模板包（源文件变化时自动重新编译）"""
+        try:
+            self.pack = load_pack(self.template_dir)
+        except Exception as e:
+            logger.error(f"加载模板包失败: {e}")
             return
 
-        for ext in ["*.png"]:
-            for path in self.template_dir.glob(ext):
-                name = path.stem
-                try:
-                    img = cv2.imread(str(path))
-                    if img is not None:
-                        self.template_cache[name] = img
-                except Exception as e:
-                    logger.error(f"预加载模板 '{name}' 失败: {e}")
-        logger.info(f"成功预加载 {len(self.template_cache)} 个模板到内存")
-
-    def _load_coords(self):
-        """加载坐标配置文件"""
-        if self.coords_file.exists():
-            try:
-                with open(self.coords_file, "r", encoding="utf-8") as f:
-                    self.coords = json.load(f)
-                logger.debug(f"已加载 {len(self.coords)} 个模板的坐标")
-            except Exception as e:
-                logger.error(f"加载 coords.json 失败: {e}")
-        else:
+        if self.pack is None:
+            logger.warning("未找到 templates 目录。请使用 template.py 创建模板。")
+            return
+
+        self._templates = _Templates(self.pack.coords, {})
+        if not self.coords_file.exists():
             logger.warning(
-                "在 templates 目录中未找到 coords.json。请使用 template_picker.py 创建模板。"
+                "在 templates 目录中未找到 coords.json。请使用 template.py 创建模板。"
             )
+        logger.info(f"已加载模板包: {len(self.pack)} 个模板")
+
+    def _scan_sources(self) -> dict[str, tuple[int, int]]:
+        """返回模板源文件的 {文件名: (mtime_ns, size)}。"""
+        state: dict[str, tuple[int, int]] = {}
+        if not self.template_dir.exists():
+            return state
+        for path in [*self.template_dir.glob("*.png"), self.coords_file]:
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            state[path.name] = (stat.st_mtime_ns, stat.st_size)
+        return state
+
+    def _watch_loop(self):
+        while not self._stop_watch.wait(self.reload_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"模板热更新出错: {e}")
+
+    def stop_watching(self):
+        self._stop_watch.set()
+
+    def refresh(self) -> bool:
+        """检查模板目录，只重新加载有变化的条目并整体替换快照。返回是否有更新。"""
+        new_state = self._scan_sources()
+        old_state = self._source_state
+        if new_state == old_state:
+            return False
+
+        start_time = time.perf_counter()
+        current = self._templates
+        overrides = dict(current.overrides)
+        coords = current.coords
+        applied = dict(new_state)
+        updated, removed = [], []
+
+        for filename in set(new_state) | set(old_state):
+            if new_state.get(filename) == old_state.get(filename):
+                continue
+
+            if filename == self.coords_file.name:
+                if filename not in new_state:
+                    coords = {}
+                    continue
+                try:
+                    with open(self.coords_file, "r", encoding="utf-8") as f:
+                        coords = json.load(f)
+                except (OSError, ValueError) as e:
+                    # 文件可能正在写入，下次轮询再试
+                    logger.debug(f"重新加载 coords.json 失败: {e}")
+                    applied.pop(filename, None)
+                    if filename in old_state:
+                        applied[filename] = old_state[filename]
+                continue
+
+            name = filename.removesuffix(".png")
+            if filename not in new_state:
+                overrides[name] = None
+                removed.append(name)
+                continue
+
+            img = cv2.imread(str(self.template_dir / filename))
+            if img is None:
+                applied.pop(filename, None)
+                if filename in old_state:
+                    applied[filename] = old_state[filename]
+                continue
+            overrides[name] = img
+            updated.append(name)
+
+        if coords is not current.coords:
+            self.coords_version += 1
+        self._templates = _Templates(coords, overrides)
+        self._source_state = applied
+
+        duration = time.perf_counter() - start_time
+        metrics.incr("templates.reloaded", len(updated) + len(removed))
+        metrics.observe("templates.reload", duration)
+        logger.info(
+            f"模板热更新: 更新 {updated or '无'}，删除 {removed or '无'}，"
+            f"坐标{'已' if coords is not current.coords else '未'}更新，耗时 {duration * 1000:.1f}ms"
+        )
+        return True
+
+    def _lookup(self, templates: _Templates, name: str) -> np.ndarray:
+        if name in templates.overrides:
+            img = templates.overrides[name]
+            if img is None:
+                raise FileNotFoundError(f"模板图片不存在: {name}")
+            return img
+        if self.pack is not None and name in self.pack:
+            return self.pack.get(name)
+        raise FileNotFoundError(f"模板图片不存在: {name}")
+
+    def has_template(self, name: str) -> bool:
+        """name 是否有模板图片（coords.json 中的文字检测区域没有）"""
+        templates = self._templates
+        if name in templates.overrides:
+            return templates.overrides[name] is not None
+        return self.pack is not None and name in self.pack
 
     def _get_template(self, name: str) -> np.ndarray:
         """加载模板图片"""
-        if name in self.template_cache:
-            return self.template_cache[name]
-        raise FileNotFoundError(f"模板图片不存在: {name}")
+        return self._lookup(self._templates, name)
+
+    def _signature(self, templates: _Templates, name: str) -> _Signature:
+        """模板预筛特征；模板包中的条目直接读取预计算值，热更新的模板首次使用时计算。"""
+        template = self._lookup(templates, name)
+        cached = self._signature_cache.get(name)
+        if cached is not None and cached[0] is template:
+            return cached[1]
+
+        if name not in templates.overrides and self.pack is not None:
+            signature = _Signature(self.pack.mean(name), self.pack.sqsum(name))
+        else:
+            signature = self._stats_signature(template)
+        self._signature_cache[name] = (template, signature)
+        return signature
+
+    @staticmethod
+    def _stats_signature(template: np.ndarray) -> _Signature:
+        channels = 1 if template.ndim == 2 else template.shape[2]
+        return _Signature(
+            np.array(cv2.mean(template)[:channels]), cv2.norm(template, cv2.NORM_L2SQR)
+        )
+
+    def _prefilter(
+        self, area: np.ndarray, shape: tuple[int, ...], signature: _Signature, threshold: float
+    ) -> Optional[tuple[int, int, int, int]]:
+        """
+        用窗口各通道均值给出每个匹配位置归一化平方差的下界，排除不可能命中的位置
+
+        每个通道有 Σ(a-b)² ≥ n(μa-μb)²，下界超过阈值的位置用 matchTemplate 也一定不会命中，
+        因此预筛不会漏掉真实目标。窗口统计量由盒式滤波求出，耗时与搜索区域大小成正比，
+        与模板大小无关。
+
+        Returns:
+            仍可能命中的位置的包围盒 (x1, y1, x2, y2)（相对 area，已含模板尺寸），全部排除时返回 None
+        """
+        th, tw = shape[:2]
+        h, w = area.shape[:2]
+        if h < th or w < tw:
+            metrics.incr("match.prefilter.reject")
+            return None
+
+        # 窗口左上角对齐到 (0, 0)，只取完整落在区域内的位置
+        valid = (slice(0, h - th + 1), slice(0, w - tw + 1))
+        mean = cv2.boxFilter(area, cv2.CV_32F, (tw, th), anchor=(0, 0))[valid]
+        mean_sq = cv2.sqrBoxFilter(area, cv2.CV_32F, (tw, th), anchor=(0, 0))[valid]
+
+        n = th * tw
+        channels = 1 if mean.ndim == 2 else mean.shape[2]
+        delta = cv2.subtract(mean, tuple(signature.mean.tolist()) + (0.0,) * (4 - channels))
+        diff_sq = cv2.multiply(delta, delta)
+        if channels > 1:
+            ones = np.ones((1, channels), np.float32)
+            diff_sq = cv2.transform(diff_sq, ones)
+            mean_sq = cv2.transform(mean_sq, ones)
+
+        # 下界 ≤ 阈值  ⇔  n·Σ(Δμ)² ≤ 阈值·sqrt(n·Σmean_sq·模板平方和)
+        # 单精度累加误差：左侧略向下、右侧略向上取，保证仍是下界
+        lhs = diff_sq * (n * 0.9999)
+        rhs = cv2.sqrt(mean_sq) * (threshold * float(np.sqrt(n * 1.0001 * signature.sqsum)))
+        mask = cv2.compare(lhs, rhs, cv2.CMP_LE)
+        if cv2.countNonZero(mask) == 0:
+            metrics.incr("match.prefilter.reject")
+            return None
+        metrics.incr("match.prefilter.pass")
+        x, y, bw, bh = cv2.boundingRect(mask)
+        return x, y, x + bw - 1 + tw, y + bh - 1 + th
+
+    @staticmethod
+    def _clip_region(
+        frame: np.ndarray, coords: list[int], margin: int = 0
+    ) -> Optional[tuple[int, int, int, int]]:
+        """将模板坐标（可外扩 margin 像素）裁剪到帧范围内。"""
+        if len(coords) != 4:
+            return None
+
+        x1, y1, x2, y2 = coords
+        h, w = frame.shape[:2]
+
+        x1 = max(0, min(x1 - margin, w))
+        y1 = max(0, min(y1 - margin, h))
+        x2 = max(0, min(x2 + margin, w))
+        y2 = max(0, min(y2 + margin, h))
+
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return x1, y1, x2, y2
+
+    @staticmethod
+    def _sqdiff_normed(diff_sq: float, crop_sq: float, template_sq: float) -> float:
+        """与 cv2.TM_SQDIFF_NORMED 相同的归一化平方差。"""
+        denom = (crop_sq * template_sq) ** 0.5
+        if denom == 0:
+            return 0.0 if diff_sq == 0 else 1.0
+        return diff_sq / denom
 
     def find_template(
-        self, frame: np.ndarray, target: str, template: Optional[np.ndarray] = None
+        self,
+        frame: np.ndarray,
+        target: str,
+        template: Optional[np.ndarray] = None,
+        margin: Optional[int] = None,
+        prefilter: Optional[bool] = None,
     ) -> Optional[tuple[int, int]]:
         """
         在帧中查找指定模板
@@ -65,43 +283,64 @@ class Matcher:
             frame: 屏幕帧图像
             target: 目标模板名称
             template: 可选的模板图像
+            margin: 在保存坐标周围额外搜索的像素数，默认取 config.MATCH_SEARCH_MARGIN
+            prefilter: 是否先用均值/标准差下界预筛，默认取 config.MATCH_PREFILTER
 
         Returns:
             匹配结果元组 (center_x, center_y)，未找到返回 None
         """
         threshold = 0.1
-        if target not in self.coords:
+        margin = config.MATCH_SEARCH_MARGIN if margin is None else margin
+        prefilter = config.MATCH_PREFILTER if prefilter is None else prefilter
+        templates = self._templates
+        if target not in templates.coords:
             logger.warning(f"目标 '{target}' 未在 coords.json 中定义")
             return None
 
-        coords = self.coords[target]
-        if len(coords) != 4:
+        region = self._clip_region(frame, templates.coords[target], margin)
+        if region is None:
             return None
 
-        x1, y1, x2, y2 = coords
-
-        h, w = frame.shape[:2]
+        x1, y1, x2, y2 = region
+        crop = frame[y1:y2, x1:x2]
 
-        x1 = max(0, min(x1, w))
-        y1 = max(0, min(y1, h))
-        x2 = max(0, min(x2, w))
-        y2 = max(0, min(y2, h))
+        template = self._lookup(templates, target)
+        th, tw = template.shape[:2]
 
-        if x2 <= x1 or y2 <= y1:
+        # 裁剪区域与模板同尺寸时结果只有一个值，直接计算归一化平方差
+        # 这一步本身只需几微秒，比任何预筛都便宜
+        if crop.shape == template.shape:
+            min_val = self._sqdiff_normed(
+                cv2.norm(crop, template, cv2.NORM_L2SQR),
+                cv2.norm(crop, cv2.NORM_L2SQR),
+                self._signature(templates, target).sqsum,
+            )
+            if min_val <= threshold:
+                center = (x1 + tw // 2, y1 + th // 2)
+                logger.debug(f"找到 '{target}' 匹配度={min_val:.2f} 坐标={center}")
+                return center
+            logger.debug(f"'{target}' 未找到 (匹配度 {min_val:.2f} > {threshold})")
             return None
 
-        crop = frame[y1:y2, x1:x2]
-
-        template = self._get_template(target)
+        if prefilter:
+            window = self._prefilter(
+                crop, template.shape, self._signature(templates, target), threshold
+            )
+            if window is None:
+                logger.debug(f"'{target}' 未找到 (预筛排除)")
+                return None
+            # 只在仍可能命中的位置范围内做完整匹配
+            wx1, wy1, wx2, wy2 = window
+            crop = crop[wy1:wy2, wx1:wx2]
+            x1, y1 = x1 + wx1, y1 + wy1
 
         try:
-            start_time = time.time()
+            start_time = time.perf_counter()
             res = cv2.matchTemplate(crop, template, cv2.TM_SQDIFF_NORMED)
             min_val, _, min_loc, _ = cv2.minMaxLoc(res)
-            duration = (time.time() - start_time) * 1000
+            duration = (time.perf_counter() - start_time) * 1000
 
             if min_val <= threshold:
-                th, tw = template.shape[:2]
                 center_x_crop = min_loc[0] + tw // 2
                 center_y_crop = min_loc[1] + th // 2
 
@@ -121,18 +360,119 @@ class Matcher:
             logger.error(f"匹配模板 '{target}' 时出错: {e}")
             return None
 
+    def _template_stack(
+        self, templates: _Templates, names: tuple[str, ...]
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """返回 (拼接后的模板像素 float32, 各模板起始偏移, 各模板平方和)，按快照缓存。"""
+        key = (id(templates), names)
+        cached = self._stack_cache.get(key)
+        if cached is not None and cached[0] is templates:
+            return cached[1:]
+
+        arrays = [self._lookup(templates, name).reshape(-1) for name in names]
+        flat = np.concatenate(arrays).astype(np.float32)
+        offsets = np.cumsum([0] + [a.size for a in arrays[:-1]])
+        sqsums = np.add.reduceat(flat * flat, offsets, dtype=np.float64)
+        if len(self._stack_cache) > 64:
+            self._stack_cache.clear()
+        self._stack_cache[key] = (templates, flat, offsets, sqsums)
+        return flat, offsets, sqsums
+
+    def find_templates(
+        self,
+        frame: np.ndarray,
+        targets: list[str],
+        margin: Optional[int] = None,
+        prefilter: Optional[bool] = None,
+    ) -> dict[str, Optional[tuple[int, int]]]:
+        """
+        一次匹配多个固定坐标模板
+
+        同尺寸裁剪的模板拼接后用 NumPy 一次算出所有归一化平方差；
+        其余（带搜索边距、坐标越界被裁小等）逐个走 find_template。
+        """
+        threshold = 0.1
+        margin = config.MATCH_SEARCH_MARGIN if margin is None else margin
+        prefilter = config.MATCH_PREFILTER if prefilter is None else prefilter
+        templates = self._templates
+        results: dict[str, Optional[tuple[int, int]]] = {}
+        exact_names: list[str] = []
+        crops: list[np.ndarray] = []
+        centers: list[tuple[int, int]] = []
+
+        for target in targets:
+            coords = templates.coords.get(target)
+            region = self._clip_region(frame, coords, 0) if coords else None
+            try:
+                template = self._lookup(templates, target)
+            except FileNotFoundError:
+                template = None
+
+            if (
+                margin == 0
+                and region is not None
+                and template is not None
+                and (region[3] - region[1], region[2] - region[0]) == template.shape[:2]
+            ):
+                x1, y1, x2, y2 = region
+                th, tw = template.shape[:2]
+                exact_names.append(target)
+                crops.append(frame[y1:y2, x1:x2].reshape(-1))
+                centers.append((x1 + tw // 2, y1 + th // 2))
+            else:
+                results[target] = self.find_template(
+                    frame, target, margin=margin, prefilter=prefilter
+                )
+
+        if exact_names:
+            flat, offsets, template_sq = self._template_stack(
+                templates, tuple(exact_names)
+            )
+            # 累加用 float64，与 find_template 的 cv2.norm 结果一致，避免阈值附近判定不同
+            crop_flat = np.concatenate(crops).astype(np.float32)
+            diff = crop_flat - flat
+            diff_sq = np.add.reduceat(diff * diff, offsets, dtype=np.float64)
+            crop_sq = np.add.reduceat(crop_flat * crop_flat, offsets, dtype=np.float64)
+            denom = np.sqrt(crop_sq * template_sq)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                scores = np.where(
+                    denom > 0, diff_sq / denom, np.where(diff_sq == 0, 0.0, 1.0)
+                )
+
+            for name, center, score in zip(exact_names, centers, scores):
+                results[name] = center if score <= threshold else None
+                logger.debug(f"批量匹配 '{name}' 匹配度={score:.2f}")
+
+        return {target: results[target] for target in targets}
+
     def find_template_anywhere(
-        self, frame: np.ndarray, target: str | np.ndarray
+        self,
+        frame: np.ndarray,
+        target: str | np.ndarray,
+        prefilter: Optional[bool] = None,
     ) -> Optional[tuple[int, int]]:
         threshold = 0.02
+        prefilter = config.MATCH_PREFILTER if prefilter is None else prefilter
         if isinstance(target, str):
-            traget_template = self._get_template(target)
+            templates = self._templates
+            traget_template = self._lookup(templates, target)
+            signature = self._signature(templates, target)
         elif isinstance(target, np.ndarray):
             traget_template = target
+            signature = self._stats_signature(target)
         else:
             logger.error(f"无效的目标类型: {type(target)}")
             return None
 
+        offset_x = offset_y = 0
+        if prefilter:
+            window = self._prefilter(frame, traget_template.shape, signature, threshold)
+            if window is None:
+                logger.debug(f"'{target}' 在全屏未找到 (预筛排除)")
+                return None
+            offset_x, offset_y, wx2, wy2 = window
+            frame = frame[offset_y:wy2, offset_x:wx2]
+
         try:
             frame_h, frame_w = frame.shape[:2]
             template_h, template_w = traget_template.shape[:2]
@@ -140,10 +480,10 @@ class Matcher:
                 f"开始匹配 '{target}': 帧大小=({frame_w}x{frame_h}), 模板大小=({template_w}x{template_h})"
             )
 
-            start_time = time.time()
+            start_time = time.perf_counter()
             res = cv2.matchTemplate(frame, traget_template, cv2.TM_SQDIFF_NORMED)
             min_val, _, min_loc, _ = cv2.minMaxLoc(res)
-            duration = (time.time() - start_time) * 1000
+            duration = (time.perf_counter() - start_time) * 1000
 
             logger.debug(
                 f"匹配结果: 最小匹配度={min_val:.4f}, 阈值={threshold}, 位置={min_loc}"
@@ -151,8 +491,8 @@ class Matcher:
 
             if min_val <= threshold:
                 th, tw = traget_template.shape[:2]
-                center_x = min_loc[0] + tw // 2
-                center_y = min_loc[1] + th // 2
+                center_x = offset_x + min_loc[0] + tw // 2
+                center_y = offset_y + min_loc[1] + th // 2
 
                 logger.debug(
                     f"在全屏找到 '{target}' 匹配度={min_val:.2f} 坐标=({center_x}, {center_y}), 耗时={duration:.2f}ms"
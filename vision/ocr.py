@@ -1,33 +1,80 @@
-from typing import Optional
+from typing import NamedTuple, Optional
 
 import cv2
 import numpy as np
 from rapidocr import RapidOCR
 from thefuzz import fuzz
+from utils import config
 from utils.logger import logger
 
+FUZZY_MATCH_THRESHOLD = 80
+TEXT_SCORE = 0.5  # 识别置信度下限，与 RapidOCR 的 Global.text_score 保持一致
+
+
+class TextBox(NamedTuple):
+    """整帧 OCR 识别到的一段文字"""
+
+    text: str
+    box: tuple[int, int, int, int]  # x1, y1, x2, y2
+    score: float
+
+    @property
+    def center(self) -> tuple[int, int]:
+        x1, y1, x2, y2 = self.box
+        return (x1 + x2) // 2, (y1 + y2) // 2
+
+
+def fuzzy_score(text: str, target_text: str) -> int:
+    """计算 OCR 结果与目标文本的近似匹配分数(0-100)。"""
+    candidate = text.strip()
+    target = target_text.strip()
+    if not candidate or not target:
+        return 0
+
+    # 对 OCR 常见错字/漏字更稳健: 同时考虑完整匹配与部分匹配。
+    return max(fuzz.partial_ratio(candidate, target), fuzz.ratio(candidate, target))
+
+
+def match_text(
+    boxes: list[TextBox], target_text: str, threshold: int = FUZZY_MATCH_THRESHOLD
+) -> Optional[TextBox]:
+    """在识别结果中找出与目标文字最匹配的一项，没有足够接近的返回 None。"""
+    target_text = target_text.strip()
+    best: Optional[TextBox] = None
+    best_score = 0.0
+    for item in boxes:
+        candidate = item.text.strip()
+        if not candidate:
+            continue
+
+        if target_text in candidate:
+            # 精确子串命中优先，使用极高权重避免被近似结果抢占。
+            rank_score = item.score + 1000.0
+        else:
+            score = fuzzy_score(candidate, target_text)
+            if score < threshold:
+                continue
+            # 近似命中时兼顾 OCR 置信度，减少误匹配。
+            rank_score = float(score) + item.score
+
+        if best is None or rank_score > best_score:
+            best, best_score = item, rank_score
+    return best
+
 
 class Ocr:
     def __init__(self):
-        self.reader = RapidOCR()
-        self.fuzzy_match_threshold = 80
+        self.reader = RapidOCR(params={"Global.text_score": TEXT_SCORE})
+        self.fuzzy_match_threshold = FUZZY_MATCH_THRESHOLD
         self.rec_only_reader = RapidOCR(
             params={
                 "Global.use_det": False,
                 "Global.use_cls": False,
                 "Global.use_rec": True,
+                "Global.text_score": TEXT_SCORE,
             }
         )
-
-    def _fuzzy_score(self, text: str, target_text: str) -> int:
-        """计算 OCR 结果与目标文本的近似匹配分数(0-100)。"""
-        candidate = text.strip()
-        target = target_text.strip()
-        if not candidate or not target:
-            return 0
-
-        # 对 OCR 常见错字/漏字更稳健: 同时考虑完整匹配与部分匹配。
-        return max(fuzz.partial_ratio(candidate, target), fuzz.ratio(candidate, target))
+        self._det_only_reader: Optional[RapidOCR] = None
 
     def _run_ocr(
         self,
@@ -68,6 +115,74 @@ class Ocr:
 
         return normalized
 
+    def _det_reader(self) -> RapidOCR:
+        """仅检测模式；缩放由调用方完成，关闭按短边放大输入的默认行为"""
+        if self._det_only_reader is None:
+            self._det_only_reader = RapidOCR(
+                params={
+                    "Global.use_det": True,
+                    "Global.use_cls": False,
+                    "Global.use_rec": False,
+                    "Det.limit_type": "max",
+                    "Det.limit_side_len": 4096,
+                }
+            )
+        return self._det_only_reader
+
+    def _recognize(self, crops: list[np.ndarray]) -> list[tuple[str, float]]:
+        """
+        对多个文字区域裁剪图做一次识别推理，返回 [(文字, 置信度), ...]
+
+        recognize_txt 不经过 RapidOCR.__call__ 的 text_score 过滤，
+        这里按同样的 TEXT_SCORE 丢弃低置信度结果（文字置空）。
+        """
+        try:
+            rec_res = self.rec_only_reader.recognize_txt(crops)
+            txts = rec_res.txts or ()
+            scores = getattr(rec_res, "scores", None) or (1.0,) * len(txts)
+            recognized = [
+                (str(text or ""), float(score)) for text, score in zip(txts, scores)
+            ]
+        except Exception as e:
+            logger.debug(f"批量识别失败，逐个识别: {e}")
+            recognized = []
+            for crop in crops:
+                results = self._run_ocr(crop, reader=self.rec_only_reader)
+                text = " ".join(text for _, text, _ in results)
+                conf = max((conf for _, _, conf in results), default=0.0)
+                recognized.append((text, conf))
+
+        return [
+            (text if score >= TEXT_SCORE else "", score) for text, score in recognized
+        ]
+
+    def _run_ocr_downscaled(
+        self, image: np.ndarray, scale: float
+    ) -> list[tuple[np.ndarray, str, float]]:
+        """在缩小 scale 倍的图上检测文字区域，映射回原图坐标后在原图上裁剪识别"""
+        small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        boxes = getattr(self._det_reader()(small), "boxes", None)
+        if boxes is None or len(boxes) == 0:
+            return []
+
+        h, w = image.shape[:2]
+        quads, crops = [], []
+        for box in boxes:
+            quad = np.array(box, dtype=np.float32) / scale
+            x, y, bw, bh = cv2.boundingRect(quad)
+            x1, y1 = max(x, 0), max(y, 0)
+            x2, y2 = min(x + bw, w), min(y + bh, h)
+            if x2 <= x1 or y2 <= y1:
+                continue
+            quads.append(quad)
+            crops.append(image[y1:y2, x1:x2])
+
+        return [
+            (quad, text, conf)
+            for quad, (text, conf) in zip(quads, self._recognize(crops))
+            if text
+        ]
+
     def _preprocess_image(self, crop_img: np.ndarray) -> np.ndarray:
         """缩放 x2, 阈值 120 (手动), 形态学操作=None"""
         gray = (
@@ -96,14 +211,16 @@ class Ocr:
         processed_img = self._preprocess_image(crop)
 
         try:
-            reader = self.rec_only_reader if cropped else self.reader
-            results = self._run_ocr(processed_img, reader=reader)
-
-            clean_res = " ".join([text for _, text, _ in results]).strip()
+            if cropped:
+                # 与 do_ocr_batch 走同一识别调用，批量与否结果一致
+                (text, _), = self._recognize(
+                    [cv2.cvtColor(processed_img, cv2.COLOR_GRAY2BGR)]
+                )
+            else:
+                results = self._run_ocr(processed_img, reader=self.reader)
+                text = " ".join([text for _, text, _ in results])
 
-            if whitelist:
-                whitelist_set = set(whitelist)
-                clean_res = "".join(c for c in clean_res if c in whitelist_set)
+            clean_res = self._apply_whitelist(text, whitelist)
 
             logger.debug(f"RapidOCR 识别结果: {clean_res}")
             return clean_res
@@ -112,57 +229,109 @@ class Ocr:
             logger.error(f"OCR 识别出错: {e}")
             return ""
 
-    def find_text_and_crop(
+    @staticmethod
+    def _apply_whitelist(text: str, whitelist: str) -> str:
+        """去除首尾空白，并只保留白名单内的字符。"""
+        clean_res = text.strip()
+        if whitelist:
+            whitelist_set = set(whitelist)
+            clean_res = "".join(c for c in clean_res if c in whitelist_set)
+        return clean_res
+
+    def do_ocr_batch(self, items: list[tuple[np.ndarray, list[int], str]]) -> list[str]:
+        """批量识别多个 (frame, roi, whitelist)，所有裁剪图在一次识别推理中完成。"""
+        if not items:
+            return []
+
+        crops = []
+        for frame, roi, _ in items:
+            x1, y1, x2, y2 = roi
+            processed_img = self._preprocess_image(frame[y1:y2, x1:x2])
+            crops.append(cv2.cvtColor(processed_img, cv2.COLOR_GRAY2BGR))
+
+        try:
+            recognized = self._recognize(crops)
+        except Exception as e:
+            logger.error(f"批量 OCR 识别出错: {e}")
+            return [""] * len(items)
+
+        return [
+            self._apply_whitelist(text, whitelist)
+            for (_, _, whitelist), (text, _) in zip(items, recognized)
+        ]
+
+    def read_page(
         self,
         frame: np.ndarray,
-        target_text: str,
-    ) -> Optional[np.ndarray]:
-        """在整帧中查找目标文字，返回该文字对应区域的裁剪图。"""
-        if frame is None or frame.size == 0 or not target_text.strip():
-            logger.warning("OCR 目标文字为空或帧无效")
-            return None
+        roi: Optional[list[int]] = None,
+        det_scale: Optional[float] = None,
+    ) -> list[TextBox]:
+        """
+        检测+识别一次，返回所有识别到的文字及其区域（整帧坐标）。
+
+        roi 为 [x1, y1, x2, y2] 时只在该区域内检测；
+        det_scale < 1 时在缩小图上检测，默认取 config.OCR_DET_SCALE。
+        """
+        if det_scale is None:
+            det_scale = config.OCR_DET_SCALE
+        if frame is None or frame.size == 0:
+            logger.warning("OCR 帧无效")
+            return []
 
-        target_text = target_text.strip()
+        ox, oy = 0, 0
+        image = frame
+        if roi is not None:
+            ox, oy, rx2, ry2 = roi
+            image = frame[oy:ry2, ox:rx2]
+            if image.size == 0:
+                logger.warning(f"OCR ROI 配置无效: {roi}")
+                return []
 
         try:
-            results = self._run_ocr(frame)
+            if det_scale < 1:
+                results = self._run_ocr_downscaled(image, det_scale)
+            else:
+                results = self._run_ocr(image)
         except Exception as e:
             logger.error(f"OCR 定位出错: {e}")
-            return None
+            return []
 
-        matches: list[tuple[np.ndarray, float]] = []
+        h, w = image.shape[:2]
+        boxes = []
         for bbox, text, conf in results:
-            if not text:
+            x, y, bw, bh = cv2.boundingRect(np.array(bbox, dtype=np.float32))
+            x1, y1 = max(x, 0), max(y, 0)
+            x2, y2 = min(x + bw, w), min(y + bh, h)
+            if x2 <= x1 or y2 <= y1:
                 continue
+            boxes.append(
+                TextBox(text.strip(), (x1 + ox, y1 + oy, x2 + ox, y2 + oy), conf)
+            )
+        return boxes
 
-            candidate = text.strip()
-            if target_text in candidate:
-                # 精确子串命中优先，使用极高权重避免被近似结果抢占。
-                rank_score = conf + 1000.0
-                matches.append((bbox, rank_score))
-                continue
-
-            fuzzy_score = self._fuzzy_score(candidate, target_text)
-            if fuzzy_score >= self.fuzzy_match_threshold:
-                # 近似命中时兼顾 OCR 置信度，减少误匹配。
-                rank_score = float(fuzzy_score) + conf
-                matches.append((bbox, rank_score))
+    def find_text_and_crop(
+        self,
+        frame: np.ndarray,
+        target_text: str,
+        page: Optional[list[TextBox]] = None,
+        roi: Optional[list[int]] = None,
+    ) -> Optional[np.ndarray]:
+        """
+        在帧中查找目标文字，返回该文字对应区域的裁剪图。
 
-        if not matches:
-            logger.debug(f"未识别到目标文字: {target_text}")
+        page 为同一帧已有的 read_page 结果时直接复用，不再重新检测；
+        否则只在 roi（默认整帧）内检测。
+        """
+        if frame is None or frame.size == 0 or not target_text.strip():
+            logger.warning("OCR 目标文字为空或帧无效")
             return None
 
-        best_match_bbox, _ = max(matches, key=lambda x: x[1])
-
-        x, y, w, h = cv2.boundingRect(np.array(best_match_bbox, dtype=np.float32))
-
-        x1 = max(x, 0)
-        y1 = max(y, 0)
-        x2 = min(x + w, frame.shape[1])
-        y2 = min(y + h, frame.shape[0])
-
-        if x2 <= x1 or y2 <= y1:
-            logger.warning("OCR 识别到无效文本区域")
+        if page is None:
+            page = self.read_page(frame, roi)
+        match = match_text(page, target_text, self.fuzzy_match_threshold)
+        if match is None:
+            logger.debug(f"未识别到目标文字: {target_text}")
             return None
 
+        x1, y1, x2, y2 = match.box
         return frame[y1:y2, x1:x2].copy()
@@ -0,0 +1,199 @@
+"""
+模板包
+将 templates/*.png 与 coords.json 编译为可内存映射的二进制包 (templates/.pack/)：
+    data-*.npy 所有模板 BGR 像素顺序拼接的 uint8 数组，每次编译写入新文件
+    index.json 当前数据文件名、每个模板在其中的偏移与形状、平方和（归一化匹配用）、
+               各通道均值（匹配预筛用）、坐标与源文件签名
+index.json 最后以原子替换的方式切换，读取方总能拿到相互对应的索引与数据文件。
+
+用法:
+    python -m vision.pack [--templates templates]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Optional
+
+import cv2
+import numpy as np
+
+from utils.logger import logger
+
+PACK_VERSION = 4
+PACK_DIR_NAME = ".pack"
+
+KEEP_DATA_FILES = 2  # 保留最近几次编译的数据文件，供仍持有旧索引的进程映射
+
+
+def source_signature(template_dir: Path) -> str:
+    """根据模板 PNG 与 coords.json 的文件名、大小、修改时间计算签名。"""
+    digest = hashlib.sha1(f"v{PACK_VERSION}".encode())
+    paths = sorted(template_dir.glob("*.png")) + [template_dir / "coords.json"]
+    for path in paths:
+        if path.exists():
+            stat = path.stat()
+            digest.update(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()
+
+
+def _remove_stale_data(pack_dir: Path) -> None:
+    """删除较早编译留下的数据文件；仍被其他进程映射时删除失败则留待下次"""
+    files = sorted(
+        pack_dir.glob("data-*.npy"), key=lambda path: path.stat().st_mtime_ns, reverse=True
+    )
+    for path in files[KEEP_DATA_FILES:]:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def build_pack(template_dir: str | Path = "templates") -> Path:
+    """从 PNG/JSON 源文件编译模板包，返回包目录。"""
+    template_dir = Path(template_dir)
+    pack_dir = template_dir / PACK_DIR_NAME
+    pack_dir.mkdir(parents=True, exist_ok=True)
+    signature = source_signature(template_dir)
+
+    coords: dict[str, Any] = {}
+    coords_file = template_dir / "coords.json"
+    if coords_file.exists():
+        with open(coords_file, "r", encoding="utf-8") as f:
+            coords = json.load(f)
+
+    entries: dict[str, Any] = {}
+    chunks: list[np.ndarray] = []
+    offset = 0
+    for path in sorted(template_dir.glob("*.png")):
+        img = cv2.imread(str(path))
+        if img is None:
+            logger.error(f"读取模板 '{path.stem}' 失败")
+            continue
+
+        img = np.ascontiguousarray(img)
+        entries[path.stem] = {
+            "coords": coords.get(path.stem),
+            "offset": offset,
+            "shape": list(img.shape),
+            "sqsum": float(np.square(img, dtype=np.float64).sum()),
+            "mean": list(cv2.mean(img)[:3]),
+        }
+        chunks.append(img.reshape(-1))
+        offset += img.size
+
+    data = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.uint8)
+    # 数据写入唯一命名的新文件，索引写入临时文件后原子替换 index.json；
+    # 多个进程同时编译时各自写各自的文件，最后一次替换生效，不会出现索引与数据错配
+    fd, data_path = tempfile.mkstemp(prefix="data-", suffix=".npy", dir=pack_dir)
+    with os.fdopen(fd, "wb") as f:
+        np.save(f, data)
+
+    index = {
+        "version": PACK_VERSION,
+        "signature": signature,
+        "data": Path(data_path).name,
+        "coords": coords,
+        "entries": entries,
+    }
+    fd, index_path = tempfile.mkstemp(prefix="index-", suffix=".tmp", dir=pack_dir)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(index_path, pack_dir / "index.json")
+    _remove_stale_data(pack_dir)
+
+    logger.info(f"已编译模板包: {len(entries)} 个模板, {data.nbytes / 1024:.0f} KB")
+    return pack_dir
+
+
+class TemplatePack:
+    """内存映射的模板包，像素数据在首次访问时才映射。"""
+
+    def __init__(self, pack_dir: Path, index: dict[str, Any]):
+        self.pack_dir = pack_dir
+        self.signature: str = index["signature"]
+        self.data_file: str = index["data"]
+        self.coords: dict[str, list[int]] = index["coords"]
+        self._entries: dict[str, Any] = index["entries"]
+        self._data: Optional[np.ndarray] = None
+        self._views: dict[str, np.ndarray] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def names(self) -> list[str]:
+        return list(self._entries)
+
+    def _mapped(self) -> np.ndarray:
+        if self._data is None:
+            self._data = np.load(self.pack_dir / self.data_file, mmap_mode="r")
+        return self._data
+
+    def get(self, name: str) -> np.ndarray:
+        """返回模板 BGR 像素的只读视图。"""
+        view = self._views.get(name)
+        if view is None:
+            entry = self._entries[name]
+            shape = tuple(entry["shape"])
+            size = int(np.prod(shape))
+            offset = entry["offset"]
+            view = np.asarray(self._mapped()[offset : offset + size]).reshape(shape)
+            self._views[name] = view
+        return view
+
+    def sqsum(self, name: str) -> float:
+        """模板像素平方和，即 TM_SQDIFF_NORMED 分母中模板一侧的预计算值。"""
+        return self._entries[name]["sqsum"]
+
+    def mean(self, name: str) -> np.ndarray:
+        """模板各通道均值，匹配预筛用。"""
+        return np.array(self._entries[name]["mean"])
+
+
+def load_pack(
+    template_dir: str | Path = "templates", auto_rebuild: bool = True
+) -> Optional[TemplatePack]:
+    """加载模板包；源文件有变化（签名不一致）时自动重新编译。"""
+    template_dir = Path(template_dir)
+    if not template_dir.exists():
+        return None
+
+    pack_dir = template_dir / PACK_DIR_NAME
+    index_file = pack_dir / "index.json"
+    index: Optional[dict[str, Any]] = None
+    if index_file.exists():
+        with open(index_file, "r", encoding="utf-8") as f:
+            index = json.load(f)
+
+    signature = source_signature(template_dir)
+    if (
+        index is None
+        or index.get("version") != PACK_VERSION
+        or index.get("signature") != signature
+    ):
+        if not auto_rebuild:
+            return None
+        logger.info("模板源文件有变化，重新编译模板包")
+        build_pack(template_dir)
+        with open(index_file, "r", encoding="utf-8") as f:
+            index = json.load(f)
+
+    return TemplatePack(pack_dir, index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="编译模板包")
+    parser.add_argument("--templates", type=Path, default=Path("templates"))
+    args = parser.parse_args()
+    build_pack(args.templates)
+
+
+if __name__ == "__main__":
+    main()
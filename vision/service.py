@@ -0,0 +1,343 @@
+"""
+共享视觉服务
+模板与 OCR 模型只加载一次，通过 Unix socket 为多个机器人进程提供 locate / read_text，
+帧数据经共享内存传递，同时到达的识别请求合并为一次推理。
+"""
+
+import os
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker
+from multiprocessing.connection import Client, Connection, Listener, wait
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Literal, Optional, Tuple
+
+import numpy as np
+
+from utils import config
+from utils.logger import logger
+from vision.engine import VisionEngine
+from vision.ocr import TextBox
+
+
+def _attach_shm(name: str, shared_tracker: bool = False) -> SharedMemory:
+    # 附加方默认也会被 resource_tracker 登记，服务端退出时会误删客户端的共享内存；
+    # 与创建方共用同一个 resource_tracker 的子进程（spawn 启动的进程池）重复登记无影响，注销反而会删掉创建方的登记
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, track=False)
+    shm = SharedMemory(name=name)
+    if not shared_tracker:
+        resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+    return shm
+
+
+def attach_shared_frame(
+    spec: dict[str, Any], attached: dict[str, SharedMemory], shared_tracker: bool = False
+) -> np.ndarray:
+    """按 SharedFrameWriter.put 返回的描述取出帧，attached 缓存已附加的共享内存"""
+    shm = attached.get(spec["shm"])
+    if shm is None:
+        if len(attached) >= 8:
+            # 写入方扩容后旧的共享内存不再使用
+            for stale in attached.values():
+                stale.close()
+            attached.clear()
+        shm = attached[spec["shm"]] = _attach_shm(spec["shm"], shared_tracker)
+    return np.ndarray(spec["shape"], dtype=spec["dtype"], buffer=shm.buf)
+
+
+class SharedFrameWriter:
+    """
+    把帧写入一块共享内存供其他进程读取，返回可随请求发送的描述 {shm, shape, dtype}
+
+    设备可能原地更新帧缓冲（帧对象不变、像素变化），因此只有同一帧对象且设备帧序号未变时才跳过拷贝；
+    未提供 frame_index 时每次都拷贝。
+    """
+
+    def __init__(self, frame_index: Optional[Callable[[], int]] = None):
+        self.frame_index = frame_index
+        self._shm: Optional[SharedMemory] = None
+        self._last_frame: Optional[np.ndarray] = None
+        self._last_index: Optional[int] = None
+
+    def put(self, frame: np.ndarray) -> dict[str, Any]:
+        if self._shm is None or self._shm.size < frame.nbytes:
+            self.close()
+            self._shm = SharedMemory(create=True, size=frame.nbytes)
+            self._last_frame = None
+
+        index = self.frame_index() if self.frame_index is not None else None
+        if index is None or frame is not self._last_frame or index != self._last_index:
+            view = np.ndarray(frame.shape, dtype=frame.dtype, buffer=self._shm.buf)
+            view[:] = frame
+            self._last_frame = frame
+            self._last_index = index
+
+        return {"shm": self._shm.name, "shape": frame.shape, "dtype": frame.dtype.str}
+
+    def close(self) -> None:
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+        self._last_frame = None
+
+
+class VisionServer:
+    """视觉服务端。"""
+
+    def __init__(
+        self,
+        address: str = config.VISION_SERVICE_ADDRESS,
+        batch_window: float = 0.005,
+    ):
+        self.address = address
+        self.batch_window = batch_window
+        self.engine = VisionEngine()
+        self.alive = False
+        self._conns: list[Connection] = []
+        self._conns_lock = threading.Lock()
+        self._shms: dict[Connection, SharedMemory] = {}
+
+    def _accept_loop(self, listener: Listener) -> None:
+        while self.alive:
+            try:
+                conn = listener.accept()
+            except OSError:
+                break
+            with self._conns_lock:
+                self._conns.append(conn)
+            logger.info(f"视觉服务: 新客户端接入，当前 {len(self._conns)} 个")
+
+    def _drop(self, conn: Connection) -> None:
+        with self._conns_lock:
+            if conn in self._conns:
+                self._conns.remove(conn)
+        if shm := self._shms.pop(conn, None):
+            shm.close()
+        conn.close()
+        logger.info(f"视觉服务: 客户端断开，剩余 {len(self._conns)} 个")
+
+    def _frame(self, conn: Connection, request: dict[str, Any]) -> np.ndarray:
+        shm = self._shms.get(conn)
+        if shm is None or shm.name != request["shm"]:
+            if shm is not None:
+                shm.close()
+            shm = _attach_shm(request["shm"])
+            self._shms[conn] = shm
+        return np.ndarray(request["shape"], dtype=request["dtype"], buffer=shm.buf)
+
+    def _handle(self, conn: Connection, request: dict[str, Any]) -> Any:
+        op = request["op"]
+        if op == "register":
+            self.engine.register_ocr_target(*request["args"])
+            return None
+        if op == "coords":
+            return self.engine.matcher.coords
+        if op == "locate":
+            return self.engine.locate(self._frame(conn, request), *request["args"])
+        if op == "locate_many":
+            return self.engine.locate_many(
+                self._frame(conn, request), *request["args"]
+            )
+        if op == "read_text":
+            return self.engine.read_text(self._frame(conn, request), *request["args"])
+        if op == "read_page":
+            return self.engine.read_page(self._frame(conn, request), *request["args"])
+        raise ValueError(f"未知的视觉服务请求: {op}")
+
+    def _process_batch(self, batch: list[tuple[Connection, dict[str, Any]]]) -> None:
+        # 每个回复附带处理前的坐标版本号，客户端据此在模板热更新后重新拉取坐标
+        version = self.engine.matcher.coords_version
+        replies: dict[Connection, Any] = {}
+
+        # 仅识别模式的 read_text 合并为一次推理
+        rec_batch = [
+            (conn, request)
+            for conn, request in batch
+            if request["op"] == "read_text" and request["args"][1]
+        ]
+        if len(rec_batch) > 1:
+            try:
+                texts = self.engine.read_text_batch(
+                    [
+                        (self._frame(conn, request), request["args"][0])
+                        for conn, request in rec_batch
+                    ]
+                )
+                for (conn, _), text in zip(rec_batch, texts):
+                    replies[conn] = ("ok", text)
+                logger.debug(f"视觉服务: 合并 {len(rec_batch)} 个 OCR 请求")
+            except Exception as e:
+                logger.error(f"视觉服务批量 OCR 出错: {e}")
+
+        for conn, request in batch:
+            if conn in replies:
+                continue
+            try:
+                replies[conn] = ("ok", self._handle(conn, request))
+            except Exception as e:
+                replies[conn] = ("error", repr(e))
+
+        for conn, reply in replies.items():
+            try:
+                conn.send((*reply, version))
+            except (EOFError, OSError):
+                self._drop(conn)
+
+    def serve_forever(self) -> None:
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        listener = Listener(self.address, family="AF_UNIX")
+        self.alive = True
+        threading.Thread(target=self._accept_loop, args=(listener,), daemon=True).start()
+        logger.info(f"视觉服务已启动: {self.address}")
+
+        try:
+            while self.alive:
+                with self._conns_lock:
+                    conns = list(self._conns)
+                if not conns:
+                    time.sleep(0.01)
+                    continue
+
+                if not wait(conns, timeout=0.1):
+                    continue
+                # 稍作等待，收集同时到达的请求
+                time.sleep(self.batch_window)
+
+                batch = []
+                for conn in wait(conns, timeout=0):
+                    try:
+                        batch.append((conn, conn.recv()))
+                    except (EOFError, OSError):
+                        self._drop(conn)
+                if batch:
+                    self._process_batch(batch)
+        finally:
+            self.alive = False
+            listener.close()
+            for conn in list(self._conns):
+                self._drop(conn)
+
+
+class VisionClient:
+    """视觉服务客户端，接口与 VisionEngine 一致，可替代 Agent 内的进程内引擎。"""
+
+    def __init__(
+        self,
+        address: str = config.VISION_SERVICE_ADDRESS,
+        connect_timeout: float = 60.0,
+    ):
+        deadline = time.time() + connect_timeout
+        while True:
+            try:
+                self._conn = Client(address, family="AF_UNIX")
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.time() > deadline:
+                    raise ConnectionError(f"连接视觉服务失败: {address}")
+                time.sleep(0.5)
+
+        self._lock = threading.Lock()
+        self._frames = SharedFrameWriter()
+        self._coords: dict[str, list[int]] = {}
+        self._coords_version: Optional[int] = None
+        self._server_coords_version = 0
+        self._request({"op": "coords"})
+
+    @property
+    def coords(self) -> dict[str, list[int]]:
+        """服务端的模板坐标；服务端热更新 coords.json 后在下次访问时重新拉取"""
+        if self._coords_version != self._server_coords_version:
+            self._request({"op": "coords"})
+        return self._coords
+
+    def _request(self, request: dict[str, Any]) -> Any:
+        with self._lock:
+            if "frame" in request:
+                request.update(self._frames.put(request.pop("frame")))
+            self._conn.send(request)
+            status, result, version = self._conn.recv()
+        if status != "ok":
+            raise RuntimeError(f"视觉服务出错: {result}")
+        self._server_coords_version = version
+        if request["op"] == "coords":
+            self._coords, self._coords_version = result, version
+        return result
+
+    def bind_frame_index(self, frame_index: Callable[[], int]) -> None:
+        """提供设备当前帧序号，同一帧不重复写入共享内存"""
+        self._frames.frame_index = frame_index
+
+    def close(self) -> None:
+        self._conn.close()
+        self._frames.close()
+
+    def register_ocr_target(
+        self,
+        target_name: str,
+        roi: list[int],
+        whitelist: str = "",
+    ) -> None:
+        """注册 OCR 目标（转发到服务端）。"""
+        self._request({"op": "register", "args": (target_name, roi, whitelist)})
+
+    def locate(
+        self,
+        frame: np.ndarray,
+        target: str,
+        ocr: bool,
+        template_type: Optional[Literal["warehouse", "marketplace"]] = None,
+        page: Optional[list[TextBox]] = None,
+    ) -> Optional[Tuple[int, int]]:
+        """输入 frame + target_name，输出坐标。"""
+        return self._request(
+            {
+                "op": "locate",
+                "frame": frame,
+                "args": (target, ocr, template_type, page),
+            }
+        )
+
+    def locate_many(
+        self, frame: np.ndarray, targets: list[str]
+    ) -> dict[str, Optional[Tuple[int, int]]]:
+        """一次匹配多个固定坐标模板，返回 {target: 坐标或 None}。"""
+        return self._request(
+            {"op": "locate_many", "frame": frame, "args": (list(targets),)}
+        )
+
+    def read_page(
+        self, frame: np.ndarray, roi: Optional[list[int]] = None
+    ) -> list[TextBox]:
+        """OCR 一次（可限定在 roi 内），返回所有识别到的文字。"""
+        return self._request({"op": "read_page", "frame": frame, "args": (roi,)})
+
+    def get_region(self, name: str) -> Optional[list[int]]:
+        """返回 coords.json 中定义的区域（如 warehouse / marketplace 的文字检测范围），未定义返回 None。"""
+        region = self.coords.get(name)
+        return list(region) if region else None
+
+    def get_template_coords(self, target_name: str) -> Tuple[int, int]:
+        """返回 coords.json 里的静态中心坐标。"""
+        if target_name in self.coords:
+            x1, y1, x2, y2 = self.coords[target_name]
+            return (x1 + x2) // 2, (y1 + y2) // 2
+        return (0, 0)
+
+    def read_text(self, frame: np.ndarray, target_name: str, cropped: bool) -> str:
+        """输入 frame + target_name，输出 OCR 文本。"""
+        return self._request(
+            {"op": "read_text", "frame": frame, "args": (target_name, cropped)}
+        )
+
+
+def serve(address: str = config.VISION_SERVICE_ADDRESS) -> None:
+    """启动视觉服务（阻塞）。"""
+    VisionServer(address).serve_forever()
+
+
+if __name__ == "__main__":
+    serve()